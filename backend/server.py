@@ -1,17 +1,68 @@
-import os
-import json
 import gc
+import json
+from contextlib import asynccontextmanager
 from typing import List, Dict, Optional
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from github_client.fetch_repo import download_repo_zip
-from indexing.file_scanner import scan_repo_files
-from indexing.index_builder import make_documents, build_index
-from qa.qa_engine import answer_question, generate_repo_overview
+from github_client.fetch_repo import download_repo_zip, resolve_head
+from indexing.file_scanner import scan_repo
+from indexing.index_builder import make_documents, build_index, publish_index
+from db.catalog import RepoCatalog
+from db.vector_store import collection_for_url, drop_retired_collections, DEFAULT_COLLECTION
+from db.snapshot import import_snapshot, snapshot_write_lock
+from db.locks import try_index_write_lock, try_repo_write_lock, LockBusyError
+from config.settings import FILE_TREE_PAGE_SIZE, INDEX_SNAPSHOT_PATH, SERVER_WORKERS, SERVER_HOST, SERVER_PORT
+from qa.qa_engine import answer_question, answer_in_session, answer_questions_batch, generate_repo_overview
+from qa.sessions import sessions
+
+REPO_INFO_PATH = "repo_metadata.json"  # Legacy, imported into the catalog once
+
+catalog = RepoCatalog()
+
+# Index version this worker's chat sessions were last checked against
+_session_index_version = {"value": None}
+
+def startup_housekeeping():
+    """
+    Every worker runs this on startup. The first one to get the lock does the
+    work; a worker that finds it busy skips it rather than waiting, so workers
+    never hang while another process writes.
+    """
+    try:
+        lock = try_index_write_lock()
+    except LockBusyError:
+        print("Index housekeeping is running in another process; skipping it here.")
+        return
+    try:
+        catalog.import_legacy_json(REPO_INFO_PATH)
+
+        # Fresh replicas load a prebuilt index instead of re-embedding
+        if INDEX_SNAPSHOT_PATH and not catalog.get_active_repo():
+            snapshot_lock = snapshot_write_lock(INDEX_SNAPSHOT_PATH)
+            if snapshot_lock.acquire(blocking=False):
+                try:
+                    import_snapshot(INDEX_SNAPSHOT_PATH, catalog=catalog)
+                finally:
+                    snapshot_lock.release()
+            else:
+                print("The snapshot's repo is being indexed elsewhere; skipping the warm start.")
 
-app = FastAPI(title="Codebase AI Assistant")
+        # Collections retired by publishes whose grace period ran out while nothing was indexing
+        drop_retired_collections(catalog)
+    finally:
+        lock.release()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs when a worker starts serving, not at import (benchmarks and tests import this module)
+    startup_housekeeping()
+    _session_index_version["value"] = catalog.get_index_version()
+    yield
+
+app = FastAPI(title="Codebase AI Assistant", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,114 +72,215 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-REPO_INFO_PATH = "repo_metadata.json"
-
 class RepoRequest(BaseModel):
     github_url: str
     reindex: bool = False
 
+class ChatFilters(BaseModel):
+    path_prefix: Optional[str] = None
+    glob: Optional[str] = None
+    extensions: Optional[List[str]] = None
+    doc_type: Optional[str] = None  # "code", "doc" or "config"
+    language: Optional[str] = None
+    line_start: Optional[int] = None
+    line_end: Optional[int] = None
+
 class ChatRequest(BaseModel):
     query: str
     model: str = "gemini-2.5-flash"
+    filters: Optional[ChatFilters] = None
+    # Client-chosen id; turns with the same id share conversation memory
+    session_id: Optional[str] = None
+
+class BatchChatRequest(BaseModel):
+    queries: List[str]
+    model: str = "gemini-2.5-flash"
+    top_k: Optional[int] = None  # Defaults to the active repo's tuned top_k
+    filters: Optional[ChatFilters] = None
+
+def filters_dict(filters: Optional[ChatFilters]) -> Optional[Dict]:
+    if not filters:
+        return None
+    return {k: v for k, v in filters.dict().items() if v is not None} or None
 
 def get_current_repo_info():
-    if os.path.exists(REPO_INFO_PATH):
-        try:
-            with open(REPO_INFO_PATH, "r") as f:
-                return json.load(f)
-        except:
-            return None
-    return None
-
-# UPDATED: Save summary as well
-def save_repo_info(url: str, files: int, summary: str, file_paths: List[str]):
-    with open(REPO_INFO_PATH, "w") as f:
-        json.dump({
-            "url": url, 
-            "files_count": files, 
-            "summary": summary,
-            "file_paths": file_paths # <--- Store the list here
-        }, f)
+    """Active repo summary from the catalog. Never loads the file list."""
+    return catalog.get_active_repo()
 
-@app.get("/")
+def save_repo_info(url: str, summary: str, files: List[Dict], index_stats: Dict,
+                   commit_sha: Optional[str] = None) -> int:
+    # Chat keeps reading the previous index until this swaps the new one in
+    return publish_index(catalog, url, summary, files, index_stats, commit_sha)
+
+def first_page_of_paths(repo_id: int) -> Dict:
+    total, page = catalog.list_files(repo_id, limit=FILE_TREE_PAGE_SIZE)
+    return {
+        "file_paths": [f["path"] for f in page],
+        "file_paths_total": total,
+    }
 
+@app.get("/")
 def health_check():
     info = get_current_repo_info()
     return {"status": "running", "active_repo": info}
 
 @app.post("/api/load-repo")
 def load_repo(request: RepoRequest):
-    summary = None
-    file_paths = []
     gc.collect()
 
     try:
         # 1. Check Cache
+        # Every repo keeps its own collection, so switching back to one indexed
+        # earlier (here or by the batch indexer) is just a pointer update.
+        cached = None if request.reindex else catalog.get_repo(request.github_url)
         current_info = get_current_repo_info()
-        
-        # FIX 2: Relaxed Cache Check
-        # We check if the URL matches. We trust the metadata file if it exists.
-        if (not request.reindex and 
-            current_info and 
-            current_info.get("url") == request.github_url):
+        is_active = bool(cached and current_info and current_info["id"] == cached["id"])
+        # Legacy rows (no collection) live in the shared collection and are only valid while active
+        if cached and (cached.get("collection") or is_active):
+            if not is_active:
+                catalog.set_active_repo(cached["id"])
+                # Conversations on the previously active repo refer to its chunks
+                sync_sessions_with_index()
             
-            print(f"Skipping re-index. {request.github_url} is already active.")
-            
-            # Retrieve cached data
-            cached_summary = current_info.get("summary", "")
-            cached_files_count = current_info.get("files_count", 0)
-            # FIX 3: Retrieve cached file paths so the UI can build the tree
-            cached_file_paths = current_info.get("file_paths", [])
+            print(f"Skipping re-index. {request.github_url} is already indexed.")
             
+            # Retrieve cached data. Only the first page of paths is sent inline;
+            # the UI pages through the rest with /api/files or /api/tree.
             return {
                 "message": "Repository already active (Cached)",
-                "files_count": cached_files_count,
-                "chunks_count": "Stored in DB",
-                "summary": cached_summary,
-                "file_paths": cached_file_paths # <--- Return actual files!
+                "files_count": cached.get("files_count", 0),
+                "chunks_count": cached.get("chunks_count", 0),
+                "summary": cached.get("summary", ""),
+                **first_page_of_paths(cached["id"])
             }
 
         # 2. Fresh Download & Index
-        print(f"Downloading repo: {request.github_url}...")
-        repo_root = download_repo_zip(request.github_url)
-        
-        print("Scanning files...")
-        file_paths = scan_repo_files(repo_root)
-        
-        print(f"Found {len(file_paths)} supported files. Indexing & Embedding...")
-        docs = make_documents(file_paths)
-        
-        build_index(docs)
-        
-        # 3. Generate Summary
-        print("Generating repository overview...")
-        summary = generate_repo_overview()
-        
-        # 4. Save metadata INCLUDING SUMMARY (Fix for Problem #1)
-        save_repo_info(request.github_url, len(file_paths), summary, file_paths)
-        
-        return {
-            "message": "Repository indexed and analyzed",
-            "files_count": len(file_paths),
-            "chunks_count": "Stored in DB",
-            "summary": summary,
-            "file_paths": file_paths
-        }
-        
+        # One build per repo at a time across all workers and processes
+        try:
+            lock = try_repo_write_lock(collection_for_url(request.github_url))
+        except LockBusyError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        try:
+            return index_repo(request.github_url)
+        finally:
+            lock.release()
+
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error: {e}")
         # Return a clean 500 error
         raise HTTPException(status_code=500, detail=str(e))
 
+def index_repo(github_url: str) -> Dict:
+    """Downloads, indexes and publishes a repo. Caller holds the repo's write lock."""
+    print(f"Downloading repo: {github_url}...")
+    branch, commit_sha = resolve_head(github_url)
+    repo_root = download_repo_zip(github_url, ref=commit_sha or branch)
+    
+    print("Scanning files...")
+    skipped = {}
+    scanned = scan_repo(repo_root, stats=skipped)
+    file_paths = [f["path"] for f in scanned]
+    total_bytes = sum(f["size"] for f in scanned)
+    
+    print(f"Found {len(file_paths)} supported files ({total_bytes} bytes). Skipped: {skipped}")
+    print("Indexing & Embedding...")
+    docs = make_documents(file_paths)
+    
+    collection = collection_for_url(github_url)
+    index_stats = build_index(docs, repo_root=repo_root, collection_name=collection)
+    
+    # 3. Generate Summary
+    print("Generating repository overview...")
+    summary = generate_repo_overview(index_stats["collection"])
+    
+    # 4. Save metadata INCLUDING SUMMARY (Fix for Problem #1)
+    repo_id = save_repo_info(github_url, summary, scanned, index_stats, commit_sha)
+    # Conversations on the old index refer to its chunks
+    sync_sessions_with_index()
+    
+    return {
+        "message": "Repository indexed and analyzed",
+        "files_count": len(file_paths),
+        "chunks_count": index_stats["chunks_count"],
+        "dedup": index_stats["dedup"],
+        "summary": summary,
+        **first_page_of_paths(repo_id)
+    }
+
+def _active_repo_id() -> int:
+    info = get_current_repo_info()
+    if not info:
+        raise HTTPException(status_code=404, detail="No repository is loaded")
+    return info["id"]
+
+@app.get("/api/files")
+def list_files(prefix: str = "", offset: int = 0, limit: int = Query(500, ge=1, le=5000)):
+    """Paginated, prefix-filtered list of indexed files for the active repo."""
+    total, files = catalog.list_files(_active_repo_id(), prefix=prefix, offset=offset, limit=limit)
+    return {"total": total, "offset": offset, "limit": limit, "files": files}
+
+@app.get("/api/tree")
+def list_tree(prefix: str = ""):
+    """One level of the file tree under `prefix`, for lazy expansion in the UI."""
+    tree = catalog.list_tree(_active_repo_id(), prefix=prefix)
+    return {"prefix": prefix, **tree}
+
+def sync_sessions_with_index():
+    """
+    Sessions are shared through the catalog. When any worker swaps in a new
+    index, the first to notice the version change here drops the conversations
+    built on a collection that no longer serves chat (a session on the wrong
+    collection also starts over when it is next loaded). Version bumps that
+    keep the collection (tuned settings) leave conversations alone.
+    """
+    version = catalog.get_index_version()
+    if version != _session_index_version["value"]:
+        dropped = sessions.keep_collection(catalog.get_active_collection(DEFAULT_COLLECTION))
+        if dropped:
+            print(f"Dropped {dropped} chat sessions on a replaced index.")
+        _session_index_version["value"] = version
+
 @app.post("/api/chat")
 def chat(request: ChatRequest):
     try:
-        answer = answer_question(request.query, model_name=request.model)
+        filters = filters_dict(request.filters)
+        if request.session_id:
+            sync_sessions_with_index()
+            answer = answer_in_session(request.session_id, request.query, model_name=request.model, filters=filters)
+            return {"answer": answer, "session_id": request.session_id}
+        answer = answer_question(request.query, model_name=request.model, filters=filters)
         return {"answer": answer}
     except Exception as e:
         print(f"Error generating answer: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.delete("/api/chat/sessions/{session_id}")
+def end_session(session_id: str):
+    return {"deleted": sessions.delete(session_id)}
+
+@app.post("/api/chat/batch")
+def chat_batch(request: BatchChatRequest):
+    """
+    Answers many questions in one call. Streams NDJSON lines
+    {"index", "query", "answer"} as answers complete.
+    """
+    def stream():
+        try:
+            results = answer_questions_batch(
+                request.queries, model_name=request.model, top_k=request.top_k,
+                filters=filters_dict(request.filters)
+            )
+            for result in results:
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            print(f"Error in batch chat: {e}")
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Import string so uvicorn can start SERVER_WORKERS processes; run from the repo root
+    uvicorn.run("backend.server:app", host=SERVER_HOST, port=SERVER_PORT, workers=SERVER_WORKERS)
\ No newline at end of file
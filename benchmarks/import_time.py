@@ -0,0 +1,74 @@
+# benchmarks/import_time.py
+"""
+Cold import time of the entry points, measured in fresh interpreters.
+
+    python benchmarks/import_time.py [--runs 5] [--top 10]
+
+Reports the median wall time per module and the slowest imports
+(cumulative, from `python -X importtime`) of the last run. Imports run from a
+scratch directory, so any file a module creates on import stays out of the checkout.
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+MODULES = ["qa.qa_engine", "backend.server", "main"]
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# "import time: self [us] | cumulative | imported package" - nesting is shown by extra indent
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\| (.+)")
+
+
+def measure(module: str, workdir: str) -> tuple:
+    """Returns (wall seconds, [(cumulative_us, name), ...]) for one cold import."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")]))}
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", f"import {module}"],
+        cwd=workdir,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            entries.append((int(match.group(2)), match.group(3).rstrip()))
+    return elapsed, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        timings = []
+        entries = []
+        for _ in range(args.runs):
+            with tempfile.TemporaryDirectory() as workdir:
+                elapsed, entries = measure(module, workdir)
+            timings.append(elapsed)
+
+        print(f"\n{module}: median {statistics.median(timings) * 1000:.0f} ms "
+              f"(min {min(timings) * 1000:.0f} ms, {args.runs} runs)")
+        # Cumulative times nest (a package includes its children), indentation shows depth
+        heaviest = [(us, name) for us, name in entries if name.strip() != module]
+        for us, name in sorted(heaviest, reverse=True)[:args.top]:
+            print(f"  {us / 1000:8.1f} ms  {name.strip()}")
+
+
+if __name__ == "__main__":
+    main()
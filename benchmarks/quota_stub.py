@@ -0,0 +1,111 @@
+# benchmarks/quota_stub.py
+"""
+Local HTTP server that enforces a fixed-window request quota, like a provider API.
+
+    python benchmarks/quota_stub.py [--limit 5] [--window 1.0] [--port 8765]
+
+Requests over the quota get a 429 with Retry-After (whole seconds until the
+window resets). The server counts clients that come back before the
+Retry-After they were given, so a test can assert the header is honoured.
+"""
+import math
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Requests this soon after a 429 were already in flight when it was sent
+IN_FLIGHT_GRACE = 0.25  # seconds
+
+
+class QuotaStub:
+    def __init__(self, limit: int = 5, window: float = 1.0, host: str = "127.0.0.1", port: int = 0):
+        self.limit = limit
+        self.window = window
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.blocked_until = 0.0
+        self.last_429 = float("-inf")
+        self.served = 0
+        self.rejected = 0
+        self.early_retries = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def admit(self) -> float:
+        """0 if the request fits the quota, otherwise the seconds to wait."""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.blocked_until and now - self.last_429 > IN_FLIGHT_GRACE:
+                self.early_retries += 1
+            if now - self.window_start >= self.window:
+                self.window_start, self.window_count = now, 0
+            if self.window_count < self.limit:
+                self.window_count += 1
+                self.served += 1
+                return 0.0
+            self.rejected += 1
+            wait = self.window_start + self.window - now
+            self.blocked_until = max(self.blocked_until, now + wait)
+            self.last_429 = now
+            return wait
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                wait = stub.admit()
+                if wait:
+                    self.send_response(429)
+                    self.send_header("Retry-After", str(max(1, math.ceil(wait))))
+                    body = b'{"error": "quota exceeded"}'
+                else:
+                    self.send_response(200)
+                    body = b'{"ok": true}'
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "QuotaStub":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=5, help="Requests allowed per window")
+    parser.add_argument("--window", type=float, default=1.0, help="Window length in seconds")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    stub = QuotaStub(args.limit, args.window, port=args.port)
+    print(f"Quota stub on {stub.url}: {args.limit} requests per {args.window}s")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"served={stub.served} rejected={stub.rejected} early_retries={stub.early_retries}")
+
+
+if __name__ == "__main__":
+    main()
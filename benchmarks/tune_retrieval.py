@@ -0,0 +1,291 @@
+# benchmarks/tune_retrieval.py
+"""
+Retrieval quality vs. cost sweep over top_k, HNSW and chunking settings.
+
+    python benchmarks/tune_retrieval.py --repo-root downloaded_repos/owner_repo/repo-main \\
+        --questions questions.jsonl [--chunk-sizes 600,1000,1500] [--overlaps 100,200] \\
+        [--hnsw-m 8,16,32] [--ef-construction 100,200] [--ef-search 10,50,100] \\
+        [--top-k 3,5,8,12] [--out results.json] [--persist URL --choose best|ROW]
+
+`questions` is JSON or JSONL of {"question": str, "expected_files": [repo-relative paths]}.
+
+Every (chunk_size, overlap) pair is chunked and embedded once; vectors are cached on
+disk per pair, so re-running with other HNSW or top_k values costs no embedding calls.
+Each (M, ef_construction) pair gets a throwaway Chroma index outside the live store.
+
+Reports recall@k (share of expected files among the hits), MRR, p50/p95 query latency,
+build time and index size (the persisted HNSW + SQLite files, close to its memory use),
+marking Pareto-optimal rows with '*'. --persist saves a row as the repo's settings in
+the catalog: top_k and ef_search apply immediately (and ef_search is re-applied to every
+collection the repo publishes later), chunking and M/ef_construction at the next build.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from config.settings import EMBEDDING_MODEL, INDEX_SETTING_DEFAULTS  # noqa: E402
+from indexing.file_scanner import scan_repo  # noqa: E402
+from indexing.index_builder import make_documents, chunk_documents  # noqa: E402
+from indexing.dedup import deduplicate_chunks  # noqa: E402
+from llm.gemini_client import get_embeddings, get_query_embeddings  # noqa: E402
+from db.vector_store import VectorStore, hnsw_metadata, collection_for_url  # noqa: E402
+from db.catalog import RepoCatalog  # noqa: E402
+
+DEFAULT_CACHE_DIR = os.path.join(REPO_ROOT, "benchmarks", ".tune_cache")
+
+# Columns of the report: (key, header, width, format spec)
+COLUMNS = [
+    ("chunk_size", "chunk", 6, "d"),
+    ("chunk_overlap", "ovl", 4, "d"),
+    ("hnsw_m", "M", 3, "d"),
+    ("hnsw_ef_construction", "efC", 4, "d"),
+    ("hnsw_ef_search", "efS", 4, "d"),
+    ("top_k", "k", 3, "d"),
+    ("recall", "recall", 6, ".3f"),
+    ("mrr", "MRR", 6, ".3f"),
+    ("p50_ms", "p50ms", 6, ".1f"),
+    ("p95_ms", "p95ms", 6, ".1f"),
+    ("build_s", "build_s", 7, ".2f"),
+    ("index_mb", "idx_MB", 6, ".2f"),
+]
+
+
+def int_list(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def load_questions(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+    items = json.loads(text) if text.startswith("[") else [json.loads(line) for line in text.splitlines() if line.strip()]
+    for item in items:
+        paths = [p.replace(os.sep, "/") for p in item["expected_files"]]
+        item["expected_files"] = [p[2:] if p.startswith("./") else p for p in paths]
+    return items
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def cached_vectors(texts, cache_path: str, embed) -> list:
+    """Vectors for `texts`, embedding only those missing from the JSON cache at `cache_path`."""
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    if cache.get("model") != EMBEDDING_MODEL:
+        cache = {"model": EMBEDDING_MODEL, "vectors": {}}
+
+    vectors = cache["vectors"]
+    missing = list(dict.fromkeys(t for t in texts if _text_key(t) not in vectors))
+    if missing:
+        print(f"Embedding {len(missing)} texts (cache: {os.path.basename(cache_path)})...")
+        for text, vector in zip(missing, embed(missing)):
+            if vector:
+                vectors[_text_key(text)] = list(vector)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+    return [vectors.get(_text_key(t)) for t in texts]
+
+
+def embedded_records(docs, repo_root: str, chunk_size: int, overlap: int, cache_dir: str):
+    """Chunks and dedups like a real build; returns records carrying 'embedding'."""
+    raw_chunks = chunk_documents(docs, repo_root, chunk_size, overlap)
+    canonical, near_duplicates, _ = deduplicate_chunks(raw_chunks)
+    cache_path = os.path.join(cache_dir, f"embeddings_cs{chunk_size}_ov{overlap}.json")
+    vectors = cached_vectors([c["chunk"] for c in canonical], cache_path, get_embeddings)
+
+    by_id = {}
+    records = []
+    for item, vector in zip(canonical, vectors):
+        if vector:
+            item["embedding"] = vector
+            by_id[item["id"]] = vector
+            records.append(item)
+    for item in near_duplicates:
+        if item["dup_of"] in by_id:
+            item["embedding"] = by_id[item["dup_of"]]
+            records.append(item)
+    return records
+
+
+def dir_size_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / (1024 * 1024)
+
+
+def score(hits, expected, repo_root: str):
+    """(recall, reciprocal rank) of one question's hits against its expected files."""
+    expected = set(expected)
+    found = set()
+    first_rank = 0
+    for rank, hit in enumerate(hits, start=1):
+        # Files folded into a hit as duplicates are shown to the model too
+        paths = [hit["path"]] + hit.get("also_in", [])
+        rel_paths = {os.path.relpath(p, repo_root).replace(os.sep, "/") for p in paths}
+        matched = rel_paths & expected
+        if matched and not first_rank:
+            first_rank = rank
+        found |= matched
+    recall = len(found) / len(expected) if expected else 0.0
+    return recall, (1.0 / first_rank if first_rank else 0.0)
+
+
+def sweep(args):
+    import chromadb
+
+    repo_root = args.repo_root
+    if args.url and not repo_root:
+        from github_client.fetch_repo import download_repo_zip
+        repo_root = download_repo_zip(args.url)
+    questions = load_questions(args.questions)
+    print(f"{len(questions)} questions against {repo_root}")
+
+    docs = make_documents([f["path"] for f in scan_repo(repo_root)])
+    query_vectors = cached_vectors(
+        [q["question"] for q in questions], os.path.join(args.cache_dir, "queries.json"), get_query_embeddings
+    )
+
+    rows = []
+    for chunk_size in args.chunk_sizes:
+        for overlap in args.overlaps:
+            records = embedded_records(docs, repo_root, chunk_size, overlap, args.cache_dir)
+            for m in args.hnsw_m:
+                for ef_construction in args.ef_construction:
+                    settings = {**INDEX_SETTING_DEFAULTS, "chunk_size": chunk_size, "chunk_overlap": overlap,
+                                "hnsw_m": m, "hnsw_ef_construction": ef_construction}
+                    # A fresh path per index: chromadb caches clients by path within a process
+                    os.makedirs(args.cache_dir, exist_ok=True)
+                    index_dir = tempfile.mkdtemp(prefix=f"index_cs{chunk_size}_m{m}_", dir=args.cache_dir)
+                    client = chromadb.PersistentClient(path=index_dir)
+
+                    started = time.perf_counter()
+                    store = VectorStore("tune", hnsw=hnsw_metadata(settings), client=client)
+                    step = client.get_max_batch_size()
+                    for start in range(0, len(records), step):
+                        store.add_documents(records[start:start + step])
+                    store.count()  # Make sure the index is flushed before timing stops
+                    build_s = time.perf_counter() - started
+                    index_mb = dir_size_mb(index_dir)
+
+                    for ef_search in args.ef_search:
+                        store.set_search_ef(ef_search)
+                        for top_k in args.top_k:
+                            latencies, recalls, reciprocal_ranks = [], [], []
+                            for question, vector in zip(questions, query_vectors):
+                                if not vector:
+                                    continue
+                                t0 = time.perf_counter()
+                                hits = store.search(vector, top_k=top_k)
+                                latencies.append((time.perf_counter() - t0) * 1000)
+                                recall, rr = score(hits, question["expected_files"], repo_root)
+                                recalls.append(recall)
+                                reciprocal_ranks.append(rr)
+                            latencies.sort()
+                            rows.append({
+                                **{k: settings[k] for k in ("chunk_size", "chunk_overlap", "hnsw_m",
+                                                            "hnsw_ef_construction")},
+                                "hnsw_ef_search": ef_search,
+                                "top_k": top_k,
+                                "recall": statistics.mean(recalls) if recalls else 0.0,
+                                "mrr": statistics.mean(reciprocal_ranks) if reciprocal_ranks else 0.0,
+                                "p50_ms": statistics.median(latencies) if latencies else 0.0,
+                                "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+                                "build_s": build_s,
+                                "index_mb": index_mb,
+                            })
+
+                    client.delete_collection("tune")
+                    shutil.rmtree(index_dir, ignore_errors=True)
+    return rows
+
+
+def _objectives(row):
+    # Larger is better for every entry
+    return (row["recall"], row["mrr"], -row["p50_ms"], -row["index_mb"])
+
+
+def mark_pareto(rows):
+    """A row is on the front unless another is no worse on recall, MRR, latency and size and better on one."""
+    for row in rows:
+        mine = _objectives(row)
+        row["pareto"] = not any(
+            all(o >= m for o, m in zip(theirs, mine)) and theirs != mine
+            for theirs in (_objectives(other) for other in rows)
+        )
+
+
+def print_table(rows):
+    print("\n  row " + " ".join(f"{header:>{width}}" for _, header, width, _ in COLUMNS))
+    for i, row in enumerate(rows):
+        cells = " ".join(f"{row[key]:>{width}{spec}}" for key, _, width, spec in COLUMNS)
+        print(f"{'*' if row['pareto'] else ' '}{i:>4} {cells}")
+    print("\n* = Pareto-optimal on recall, MRR, p50 latency and index size")
+
+
+def pick(rows, choose: str):
+    if choose == "best":
+        front = [r for r in rows if r["pareto"]]
+        return max(front, key=lambda r: (r["recall"], r["mrr"], -r["p50_ms"]))
+    return rows[int(choose)]
+
+
+def persist(url: str, row):
+    """Saves a row as the repo's index settings and applies ef_search to its live index."""
+    settings = {key: row[key] for key in INDEX_SETTING_DEFAULTS}
+    catalog = RepoCatalog()
+    catalog.set_index_settings(collection_for_url(url), settings)
+    repo = catalog.get_repo(url)
+    if repo and repo.get("collection"):
+        VectorStore(repo["collection"]).set_search_ef(settings["hnsw_ef_search"])
+    print(f"Saved settings for {url}: {settings}")
+    print("top_k and ef_search are live (later publishes keep this ef_search); "
+          "chunking and M/ef_construction apply when the repo is re-indexed.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--repo-root", help="Local checkout of the repo")
+    source.add_argument("--url", help="GitHub URL, downloaded first")
+    parser.add_argument("--questions", required=True)
+    parser.add_argument("--top-k", type=int_list, default=[3, 5, 8, 12])
+    parser.add_argument("--chunk-sizes", type=int_list, default=[INDEX_SETTING_DEFAULTS["chunk_size"]])
+    parser.add_argument("--overlaps", type=int_list, default=[INDEX_SETTING_DEFAULTS["chunk_overlap"]])
+    parser.add_argument("--hnsw-m", type=int_list, default=[8, 16, 32])
+    parser.add_argument("--ef-construction", type=int_list, default=[100, 200])
+    parser.add_argument("--ef-search", type=int_list, default=[10, 50, 100])
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--out", help="Write all rows as JSON")
+    parser.add_argument("--persist", metavar="URL", help="Save a row as this repo's settings")
+    parser.add_argument("--choose", default="best", help="Row number to persist, or 'best' (default)")
+    args = parser.parse_args()
+
+    rows = sweep(args)
+    rows.sort(key=lambda r: (-r["recall"], -r["mrr"], r["p50_ms"]))
+    mark_pareto(rows)
+    print_table(rows)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Rows written to {args.out}")
+    if args.persist:
+        persist(args.persist, pick(rows, args.choose))
+
+
+if __name__ == "__main__":
+    main()
@@ -19,10 +19,71 @@ EMBEDDING_MODEL = "models/text-embedding-004"
 
 # ChromaDB Persistence Directory (It will create this folder)
 CHROMA_DB_PATH = "chroma_db_store"
+# Replaced collections stay readable this long, for requests still holding them
+RETIRED_COLLECTION_GRACE_SECONDS = 600
+
+# SQLite catalog of indexed repos and files (replaces repo_metadata.json)
+CATALOG_DB_PATH = "repo_catalog.db"
+# Optional index snapshot to warm-start from when the catalog is empty (see db/snapshot.py)
+INDEX_SNAPSHOT_PATH = os.getenv("INDEX_SNAPSHOT_PATH")
+# Max files returned inline by /api/load-repo; the rest is paged via /api/files
+FILE_TREE_PAGE_SIZE = 2000
+
+# Multi-worker serving: one writer per repo at a time, every worker reads them
+INDEX_LOCK_PATH = os.getenv("INDEX_LOCK_PATH", "index_build.lock")  # Startup housekeeping
+INDEX_LOCK_DIR = os.getenv("INDEX_LOCK_DIR", "index_locks")  # One lock file per repo collection
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+
+# Batch QA
+EMBED_BATCH_SIZE = 100  # Texts per embed_content request
+
+# Provider quotas enforced by llm/rate_limiter.py (requests/min, tokens/min, max parallel calls).
+# "gemini-embed" is separate because Gemini meters embeddings apart from generation.
+PROVIDER_RATE_LIMITS = {
+    "gemini": {"rpm": 1000, "tpm": 1_000_000, "max_concurrency": 8},
+    "gemini-embed": {"rpm": 1500, "tpm": 1_000_000, "max_concurrency": 4},
+    "openai": {"rpm": 500, "tpm": 300_000, "max_concurrency": 8},
+    "deepseek": {"rpm": 300, "tpm": 300_000, "max_concurrency": 4},
+    "grok": {"rpm": 300, "tpm": 300_000, "max_concurrency": 4},
+}
+RATE_LIMIT_MAX_RETRIES = 8
+
+# Batch indexing (main.py batch)
+BATCH_DOWNLOAD_WORKERS = 4   # Concurrent GitHub downloads
+BATCH_CHUNK_WORKERS = os.cpu_count() or 2  # Processes for reading and splitting files
+BATCH_REPO_WORKERS = 8       # Repos in flight at once; embedding is bounded by the governor
+BATCH_CHUNK_FILES = 200      # Files per process-pool task
+
+# Chat sessions (server-side conversation memory)
+SESSION_TTL_SECONDS = 30 * 60
+SESSION_MAX_COUNT = 1000
+SESSION_MAX_BYTES = 64 * 1024 * 1024  # Across all sessions
+SESSION_MAX_TURNS = 6
+FOLLOWUP_TOP_K = 4  # Earlier turns already carry most of the context
+
+# PDF extraction (indexing/pdf_extractor.py)
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "pdf_text_cache")  # Page texts keyed by file hash
+PDF_MAX_PAGES = 300      # Pages indexed per PDF; 0 = no cap
+PDF_PAGE_MODE = "head"   # "head" = first pages, "sample" = spread across the document
+PDF_CACHE_MAX_MB = int(os.getenv("PDF_CACHE_MAX_MB", "512"))  # Least recently used entries go first
+PDF_CACHE_MAX_AGE_DAYS = 30  # Entries not read for this long are dropped; 0 = no age limit
 
 # Text Splitting
 CHUNK_SIZE = 1000
-CHUNK_OVERLAP = 200
+CHUNK_OVERLAP = 100  # Carried between pieces of blocks too large for one chunk; part of every build's fingerprint
+
+# Retrieval / index settings. Each repo can override these in the catalog
+# (see benchmarks/tune_retrieval.py); HNSW and chunking apply from the next build.
+INDEX_SETTING_DEFAULTS = {
+    "top_k": 8,                   # Chunks retrieved per question
+    "chunk_size": CHUNK_SIZE,
+    "chunk_overlap": CHUNK_OVERLAP,
+    "hnsw_m": 16,                 # Chroma's defaults
+    "hnsw_ef_construction": 100,
+    "hnsw_ef_search": 100,
+}
 
 # Models
 GENERATION_MODEL = "gemini-2.5-flash"
@@ -0,0 +1,383 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple
+from config.settings import CATALOG_DB_PATH, INDEX_SETTING_DEFAULTS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL UNIQUE,
+    files_count INTEGER NOT NULL DEFAULT 0,
+    chunks_count INTEGER NOT NULL DEFAULT 0,
+    summary TEXT,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS files (
+    repo_id INTEGER NOT NULL REFERENCES repos(id) ON DELETE CASCADE,
+    rel_path TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    chunk_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (repo_id, rel_path)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+-- Tuned overrides of INDEX_SETTING_DEFAULTS, keyed by a repo's base collection name
+CREATE TABLE IF NOT EXISTS collection_settings (
+    collection TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (collection, key)
+) WITHOUT ROWID;
+-- Collections replaced by a publish, dropped once their grace period is over
+CREATE TABLE IF NOT EXISTS retired_collections (
+    name TEXT PRIMARY KEY,
+    retired_at REAL NOT NULL
+) WITHOUT ROWID;
+-- Chat sessions (qa/sessions.py), here so every server worker sees the same conversations
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    id TEXT PRIMARY KEY,
+    collection TEXT,
+    data TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chat_sessions_last_used ON chat_sessions (last_used);
+"""
+
+# Columns added after the first release of the schema: name -> DDL
+MIGRATIONS = {
+    ("repos", "embedding_calls_saved"): "ALTER TABLE repos ADD COLUMN embedding_calls_saved INTEGER NOT NULL DEFAULT 0",
+    ("repos", "bytes_saved"): "ALTER TABLE repos ADD COLUMN bytes_saved INTEGER NOT NULL DEFAULT 0",
+    ("repos", "commit_sha"): "ALTER TABLE repos ADD COLUMN commit_sha TEXT",
+    # NULL means the shared legacy "codebase" collection
+    ("repos", "collection"): "ALTER TABLE repos ADD COLUMN collection TEXT",
+    # Chunks of the file that are exact duplicates stored under another file's record
+    ("files", "shared_chunk_count"): "ALTER TABLE files ADD COLUMN shared_chunk_count INTEGER NOT NULL DEFAULT 0",
+}
+
+FILE_COLUMNS = ("rel_path", "path", "size", "chunk_count", "shared_chunk_count")
+
+# Highest code point, used as an upper bound for prefix range scans on the primary key
+PREFIX_UPPER_BOUND = "\U0010ffff"
+
+
+class RepoCatalog:
+    """
+    Small SQLite catalog of indexed repos and their files.
+    Replaces repo_metadata.json so that health checks never touch the file list.
+    """
+
+    def __init__(self, path: str = CATALOG_DB_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+
+    def _migrate(self, conn):
+        existing = {}
+        for (table, column), ddl in MIGRATIONS.items():
+            if table not in existing:
+                existing[table] = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in existing[table]:
+                conn.execute(ddl)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call keeps us safe under FastAPI's threadpool
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    # --- Repos ---
+
+    def get_active_repo(self) -> Optional[Dict]:
+        """Returns the active repo row (without files) or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT r.* FROM repos r JOIN meta m ON m.key = 'active_repo_id' AND r.id = CAST(m.value AS INTEGER)"
+            ).fetchone()
+            return dict(row) if row else None
+
+    def get_repo(self, url: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM repos WHERE url = ?", (url,)).fetchone()
+            return dict(row) if row else None
+
+    def get_active_collection(self, default: str) -> str:
+        """Collection that serves chat for the active repo."""
+        repo = self.get_active_repo()
+        return (repo or {}).get("collection") or default
+
+    def set_active_repo(self, repo_id: int):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('active_repo_id', ?)", (str(repo_id),)
+            )
+            self._bump_index_version(conn)
+
+    # --- Index version ---
+
+    def _bump_index_version(self, conn):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('index_version', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    def get_index_version(self) -> int:
+        """
+        Bumped whenever the index serving chat changes (new build swapped in or
+        another repo activated). Workers compare it to decide when to reload.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'index_version'").fetchone()
+            return int(row["value"]) if row else 0
+
+    def save_repo(self, url: str, summary: str, files: List[Dict],
+                  chunk_counts: Optional[Dict[str, int]] = None, chunks_count: int = 0,
+                  dedup: Optional[Dict] = None, commit_sha: Optional[str] = None,
+                  collection: Optional[str] = None, activate: bool = True,
+                  shared_counts: Optional[Dict[str, int]] = None) -> int:
+        """
+        Upserts a repo and replaces its file list, then marks it active (unless `activate` is False).
+        `files` are scanner entries: {'path', 'rel_path', 'size', ...}.
+        `dedup` is the report from indexing.dedup.deduplicate_chunks.
+        `shared_counts` maps a path to its chunks that live in another file's record.
+        """
+        chunk_counts = chunk_counts or {}
+        shared_counts = shared_counts or {}
+        dedup = dedup or {}
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO repos (url, files_count, chunks_count, summary, indexed_at,
+                                   embedding_calls_saved, bytes_saved, commit_sha, collection)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    files_count = excluded.files_count,
+                    chunks_count = excluded.chunks_count,
+                    summary = excluded.summary,
+                    indexed_at = excluded.indexed_at,
+                    embedding_calls_saved = excluded.embedding_calls_saved,
+                    bytes_saved = excluded.bytes_saved,
+                    commit_sha = excluded.commit_sha,
+                    collection = excluded.collection
+                """,
+                (url, len(files), chunks_count, summary, time.time(),
+                 dedup.get("embedding_calls_saved", 0), dedup.get("bytes_saved", 0), commit_sha,
+                 collection),
+            )
+            repo_id = conn.execute("SELECT id FROM repos WHERE url = ?", (url,)).fetchone()["id"]
+
+            conn.execute("DELETE FROM files WHERE repo_id = ?", (repo_id,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO files (repo_id, rel_path, path, size, chunk_count, shared_chunk_count) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (repo_id, f["rel_path"], f["path"], f.get("size", 0), chunk_counts.get(f["path"], 0),
+                     shared_counts.get(f["path"], 0))
+                    for f in files
+                ),
+            )
+            active = conn.execute("SELECT value FROM meta WHERE key = 'active_repo_id'").fetchone()
+            if activate:
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('active_repo_id', ?)", (str(repo_id),)
+                )
+            if activate or (active and active["value"] == str(repo_id)):
+                self._bump_index_version(conn)
+        return repo_id
+
+    # --- Retired collections ---
+
+    def retire_collections(self, names: List[str], keep: Optional[str] = None):
+        """
+        Records collections a publish replaced. A name already retired keeps its
+        original time; `keep` (the collection just published) is never retired.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO retired_collections (name, retired_at) VALUES (?, ?)",
+                ((name, now) for name in names if name != keep),
+            )
+            if keep:
+                conn.execute("DELETE FROM retired_collections WHERE name = ?", (keep,))
+
+    def expired_collections(self, grace_seconds: float) -> List[str]:
+        """Retired collections whose grace period is over."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT name FROM retired_collections WHERE retired_at <= ? ORDER BY retired_at",
+                (time.time() - grace_seconds,),
+            ).fetchall()
+        return [r["name"] for r in rows]
+
+    def forget_retired(self, name: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM retired_collections WHERE name = ?", (name,))
+
+    # --- Chat sessions ---
+
+    def get_session(self, session_id: str, max_age: float) -> Optional[Dict]:
+        """{'collection', 'data'} of a session used within `max_age` seconds, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT collection, data FROM chat_sessions WHERE id = ? AND last_used > ?",
+                (session_id, time.time() - max_age),
+            ).fetchone()
+        return {"collection": row["collection"], "data": json.loads(row["data"])} if row else None
+
+    def save_session(self, session_id: str, collection: Optional[str], data: Dict, size_bytes: int):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions (id, collection, data, size_bytes, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, collection, json.dumps(data), size_bytes, time.time()),
+            )
+
+    def delete_session(self, session_id: str) -> bool:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM chat_sessions WHERE id = ?", (session_id,)).rowcount > 0
+
+    def delete_sessions(self, keep_collection: Optional[str] = None) -> int:
+        """Deletes every session, or every one not on `keep_collection`. Returns how many."""
+        with self._connect() as conn:
+            if keep_collection is None:
+                return conn.execute("DELETE FROM chat_sessions").rowcount
+            return conn.execute(
+                "DELETE FROM chat_sessions WHERE collection IS NOT ?", (keep_collection,)
+            ).rowcount
+
+    def prune_sessions(self, ttl: float, max_count: int, max_bytes: int) -> int:
+        """
+        Deletes sessions idle longer than `ttl`, then the least recently used ones
+        until at most `max_count` sessions of at most `max_bytes` in total remain.
+        """
+        with self._connect() as conn:
+            removed = conn.execute(
+                "DELETE FROM chat_sessions WHERE last_used <= ?", (time.time() - ttl,)
+            ).rowcount
+            # Newest first: everything past the first row that breaks a bound goes
+            rows = conn.execute("SELECT id, size_bytes FROM chat_sessions ORDER BY last_used DESC").fetchall()
+            total = 0
+            evict = []
+            for count, row in enumerate(rows, start=1):
+                total += row["size_bytes"]
+                if evict or count > max_count or total > max_bytes:
+                    evict.append((row["id"],))
+            conn.executemany("DELETE FROM chat_sessions WHERE id = ?", evict)
+        return removed + len(evict)
+
+    # --- Index settings ---
+
+    def get_index_settings(self, collection: str) -> Dict:
+        """INDEX_SETTING_DEFAULTS with the overrides saved for `collection`."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT key, value FROM collection_settings WHERE collection = ?", (collection,)
+            ).fetchall()
+        return {**INDEX_SETTING_DEFAULTS, **{r["key"]: json.loads(r["value"]) for r in rows}}
+
+    def set_index_settings(self, collection: str, settings: Dict):
+        """Saves overrides (only known keys). Bumps the index version so workers pick up top_k."""
+        unknown = set(settings) - set(INDEX_SETTING_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown index settings: {sorted(unknown)}")
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO collection_settings (collection, key, value) VALUES (?, ?, ?)",
+                ((collection, key, json.dumps(value)) for key, value in settings.items()),
+            )
+            self._bump_index_version(conn)
+
+    # --- Files ---
+
+    def list_files(self, repo_id: int, prefix: str = "", offset: int = 0, limit: int = 500) -> Tuple[int, List[Dict]]:
+        """Paginated, prefix-filtered file listing. Returns (total, page)."""
+        where = "repo_id = ? AND rel_path >= ? AND rel_path < ?"
+        params = (repo_id, prefix, prefix + PREFIX_UPPER_BOUND)
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM files WHERE {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {', '.join(FILE_COLUMNS)} FROM files WHERE {where} ORDER BY rel_path LIMIT ? OFFSET ?",
+                params + (limit, offset),
+            ).fetchall()
+        return total, [dict(r) for r in rows]
+
+    def list_tree(self, repo_id: int, prefix: str = "") -> Dict[str, List[Dict]]:
+        """
+        One level of the file tree under `prefix` (a directory path ending in '/', or "").
+        Directories come back with their recursive file counts; grouping happens in SQLite,
+        so only the direct child files are returned as rows.
+        """
+        if prefix and not prefix.endswith("/"):
+            prefix += "/"
+        start = len(prefix) + 1
+        in_prefix = "repo_id = ? AND rel_path >= ? AND rel_path < ?"
+        bounds = (repo_id, prefix, prefix + PREFIX_UPPER_BOUND)
+        with self._connect() as conn:
+            dirs = conn.execute(
+                f"""
+                SELECT substr(rel_path, ?, instr(substr(rel_path, ?), '/') - 1) AS name, COUNT(*) AS files_count
+                FROM files
+                WHERE {in_prefix} AND instr(substr(rel_path, ?), '/') > 0
+                GROUP BY name
+                ORDER BY name
+                """,
+                (start, start) + bounds + (start,),
+            ).fetchall()
+            files = conn.execute(
+                f"""
+                SELECT {', '.join(FILE_COLUMNS)}
+                FROM files
+                WHERE {in_prefix} AND instr(substr(rel_path, ?), '/') = 0
+                ORDER BY rel_path
+                """,
+                bounds + (start,),
+            ).fetchall()
+        return {
+            "dirs": [dict(r) for r in dirs],
+            "files": [dict(r) for r in files],
+        }
+
+    def iter_files(self, repo_id: int, batch_size: int = 5000):
+        """Every file row of a repo, in rel_path order, without loading them all at once."""
+        offset = 0
+        while True:
+            _, page = self.list_files(repo_id, offset=offset, limit=batch_size)
+            if not page:
+                return
+            yield from page
+            offset += len(page)
+
+    # --- Migration ---
+
+    def import_legacy_json(self, json_path: str):
+        """One-off import of the old repo_metadata.json, if the catalog is still empty."""
+        if not os.path.exists(json_path) or self.get_active_repo():
+            return
+        try:
+            with open(json_path, "r") as f:
+                info = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not import {json_path}: {e}")
+            return
+
+        paths = info.get("file_paths", [])
+        # The old file only stored full paths; use the longest common dir as the repo root
+        root = os.path.commonpath(paths) if len(paths) > 1 else os.path.dirname(paths[0]) if paths else ""
+        files = [{"path": p, "rel_path": os.path.relpath(p, root).replace(os.sep, "/")} for p in paths]
+        self.save_repo(info.get("url", ""), info.get("summary", ""), files)
+        print(f"Imported {len(files)} files from {json_path} into the catalog.")
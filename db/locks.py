@@ -0,0 +1,101 @@
+import os
+import time
+from config.settings import INDEX_LOCK_PATH, INDEX_LOCK_DIR
+
+# Advisory inter-process lock on a file: fcntl.flock on POSIX, msvcrt.locking on Windows.
+# The OS drops it when the holder exits, so a crashed build never leaves it stuck.
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class LockBusyError(RuntimeError):
+    """Raised when a non-blocking acquire finds the lock held elsewhere."""
+
+
+class FileLock:
+    def __init__(self, path: str, poll_interval: float = 0.2):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._fd = None
+
+    def _try_lock(self, fd: int) -> bool:
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Takes the lock. Returns False instead of waiting when `blocking` is False."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        while not self._try_lock(fd):
+            if not blocking:
+                os.close(fd)
+                return False
+            time.sleep(self.poll_interval)
+        # Who holds it, for humans looking at the file
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode("ascii"))
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def index_write_lock() -> FileLock:
+    """
+    The global lock for housekeeping that isn't tied to one repo: legacy
+    metadata import, snapshot warm-start, dropping retired collections.
+    """
+    return FileLock(INDEX_LOCK_PATH)
+
+
+def try_index_write_lock() -> FileLock:
+    """Acquired index_write_lock(); raises LockBusyError if another writer holds it."""
+    lock = index_write_lock()
+    if not lock.acquire(blocking=False):
+        raise LockBusyError("Another process is doing index housekeeping")
+    return lock
+
+
+def repo_write_lock(collection: str) -> FileLock:
+    """
+    The single-writer lock for one repo's builds, publishes and snapshot imports,
+    keyed by its collection_for_url name. Shared by every server worker, the
+    batch indexer and the CLI; builds of different repos don't wait on each other.
+    """
+    return FileLock(os.path.join(INDEX_LOCK_DIR, f"{collection}.lock"))
+
+
+def try_repo_write_lock(collection: str) -> FileLock:
+    """Acquired repo_write_lock(); raises LockBusyError if this repo is being indexed elsewhere."""
+    lock = repo_write_lock(collection)
+    if not lock.acquire(blocking=False):
+        raise LockBusyError("This repository is already being indexed")
+    return lock
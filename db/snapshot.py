@@ -0,0 +1,181 @@
+import io
+import json
+import hashlib
+import zipfile
+from typing import Dict, Optional
+from config.settings import EMBEDDING_MODEL
+from db.catalog import RepoCatalog
+from db.locks import FileLock, index_write_lock, repo_write_lock
+from db.vector_store import (
+    VectorStore, DEFAULT_COLLECTION, collection_for_url, retire_collections, scope_metadata,
+)
+
+SNAPSHOT_FORMAT = "codebase-index-snapshot"
+SNAPSHOT_VERSION = 1
+
+# Members of the snapshot zip
+MANIFEST = "manifest.json"
+VECTORS = "vectors.npy"        # float32 [n, dim], row i belongs to records line i
+RECORDS = "records.jsonl"      # {"id", "document", "metadata"} per line
+FILES = "files.jsonl"          # catalog file rows of the repo
+
+
+def _upgrade_metadata(meta: Dict) -> Dict:
+    """Adds the scope metadata that records exported before CHUNK_SCHEMA 2 lack."""
+    if "dup_rel_paths" in meta:
+        return meta
+    dup_paths = [p for p in meta.get("dup_paths", "").split("\n") if p]
+    rel_path = meta.get("rel_path", "")
+    # Duplicates share the canonical file's download root
+    root = meta["path"][:len(meta["path"]) - len(rel_path)] if rel_path and meta["path"].endswith(rel_path) else ""
+    dup_rel_paths = [p[len(root):] if root and p.startswith(root) else p for p in dup_paths]
+    return {**meta, **scope_metadata(meta.get("dir", ""), dup_rel_paths)}
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot is corrupt or doesn't fit this deployment."""
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def export_snapshot(out_path: str, store: Optional[VectorStore] = None,
+                    catalog: Optional[RepoCatalog] = None) -> Dict:
+    """
+    Writes the active index (vectors, chunk texts, metadata) plus the active repo's
+    catalog entry into one versioned zip. Returns the manifest.
+    """
+    import numpy as np
+    catalog = catalog or RepoCatalog()
+    repo = catalog.get_active_repo()
+    store = store or VectorStore(catalog.get_active_collection(DEFAULT_COLLECTION))
+
+    records = io.BytesIO()
+    vector_pages = []
+    for page in store.iter_records():
+        vector_pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+        for rid, doc, meta in zip(page["ids"], page["documents"], page["metadatas"]):
+            records.write((json.dumps({"id": rid, "document": doc, "metadata": meta}) + "\n").encode("utf-8"))
+
+    vectors = np.concatenate(vector_pages) if vector_pages else np.zeros((0, 0), dtype=np.float32)
+    vectors_buf = io.BytesIO()
+    np.save(vectors_buf, vectors, allow_pickle=False)
+
+    files = io.BytesIO()
+    if repo:
+        for row in catalog.iter_files(repo["id"]):
+            files.write((json.dumps(row) + "\n").encode("utf-8"))
+
+    members = {
+        VECTORS: vectors_buf.getvalue(),
+        RECORDS: records.getvalue(),
+        FILES: files.getvalue(),
+    }
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "embedding_model": EMBEDDING_MODEL,
+        "commit_sha": repo.get("commit_sha") if repo else None,
+        "repo": {k: v for k, v in repo.items() if k != "id"} if repo else None,
+        "count": int(vectors.shape[0]),
+        "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+        "checksums": {name: _sha256(data) for name, data in members.items()},
+    }
+
+    with zipfile.ZipFile(out_path, "w") as zf:
+        zf.writestr(MANIFEST, json.dumps(manifest, indent=2))
+        # Float vectors barely compress; texts and metadata do
+        zf.writestr(VECTORS, members[VECTORS], compress_type=zipfile.ZIP_STORED)
+        zf.writestr(RECORDS, members[RECORDS], compress_type=zipfile.ZIP_DEFLATED)
+        zf.writestr(FILES, members[FILES], compress_type=zipfile.ZIP_DEFLATED)
+
+    print(f"Exported {manifest['count']} chunks to {out_path}.")
+    return manifest
+
+
+def read_manifest(path: str) -> Dict:
+    with zipfile.ZipFile(path, "r") as zf:
+        return json.loads(zf.read(MANIFEST))
+
+
+def snapshot_write_lock(path: str) -> FileLock:
+    """The lock importing `path` needs: its repo's write lock, or the global one for repo-less snapshots."""
+    repo = read_manifest(path).get("repo")
+    return repo_write_lock(collection_for_url(repo["url"])) if repo else index_write_lock()
+
+
+def import_snapshot(path: str, store: Optional[VectorStore] = None,
+                    catalog: Optional[RepoCatalog] = None, force: bool = False) -> Dict:
+    """
+    Validates and bulk-loads a snapshot into the vector store and catalog.
+    Refuses snapshots from another format version or embedding model unless `force`.
+    A snapshot that is already loaded is only re-registered in the catalog.
+    Returns the manifest.
+    """
+    import numpy as np
+    with zipfile.ZipFile(path, "r") as zf:
+        manifest = json.loads(zf.read(MANIFEST))
+        if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("version") != SNAPSHOT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot {manifest.get('format')} v{manifest.get('version')}")
+        if manifest.get("embedding_model") != EMBEDDING_MODEL and not force:
+            raise SnapshotError(
+                f"Snapshot was embedded with {manifest.get('embedding_model')}, this deployment uses {EMBEDDING_MODEL}"
+            )
+
+        members = {}
+        for name, expected in manifest["checksums"].items():
+            data = zf.read(name)
+            if _sha256(data) != expected:
+                raise SnapshotError(f"Checksum mismatch for {name} in {path}")
+            members[name] = data
+
+    vectors = np.load(io.BytesIO(members[VECTORS]), allow_pickle=False)
+    lines = members[RECORDS].decode("utf-8").splitlines()
+    if len(lines) != manifest["count"] or vectors.shape[0] != manifest["count"]:
+        raise SnapshotError("Snapshot record count doesn't match its manifest")
+
+    ids, documents, metadatas = [], [], []
+    for line in lines:
+        record = json.loads(line)
+        ids.append(record["id"])
+        documents.append(record["document"])
+        metadatas.append(_upgrade_metadata(record["metadata"]))
+
+    repo = manifest.get("repo")
+    if repo:
+        # Loaded beside the live index and swapped in through the catalog, like a build
+        base = collection_for_url(repo["url"])
+        collection = f"{base}_{manifest['checksums'][RECORDS][:12]}"
+    else:
+        collection = DEFAULT_COLLECTION
+    store = store or VectorStore(collection)
+    if repo and store.count() == manifest["count"]:
+        # Named after the records checksum, so this exact snapshot is already loaded
+        # (and may be live): clearing it would pull it out from under chat
+        print(f"{store.collection.name} already holds this snapshot; not reloading it.")
+    else:
+        store.clear_collection()
+        store.add_records(ids, vectors, documents, metadatas)
+
+    if repo:
+        catalog = catalog or RepoCatalog()
+        # The snapshot carries no HNSW settings; serve with this deployment's tuned ef_search
+        store.set_search_ef(catalog.get_index_settings(base)["hnsw_ef_search"])
+        files = [json.loads(line) for line in members[FILES].decode("utf-8").splitlines()]
+        catalog.save_repo(
+            repo["url"],
+            repo.get("summary") or "",
+            files,
+            chunk_counts={f["path"]: f.get("chunk_count", 0) for f in files},
+            chunks_count=repo.get("chunks_count", 0),
+            dedup={"embedding_calls_saved": repo.get("embedding_calls_saved", 0),
+                   "bytes_saved": repo.get("bytes_saved", 0)},
+            commit_sha=manifest.get("commit_sha"),
+            collection=store.collection.name,
+            shared_counts={f["path"]: f.get("shared_chunk_count", 0) for f in files},
+        )
+        retire_collections(catalog, base, keep=store.collection.name)
+
+    print(f"Imported {manifest['count']} chunks from {path} (commit {manifest.get('commit_sha')}).")
+    return manifest
@@ -1,27 +1,273 @@
-import chromadb
-from typing import List, Dict
-from config.settings import CHROMA_DB_PATH
+import os
+import re
+import hashlib
+import threading
+from typing import List, Dict, Optional, Callable, Tuple
+from config.settings import CHROMA_DB_PATH, RETIRED_COLLECTION_GRACE_SECONDS
+from indexing.file_scanner import PatternRule
+
+# Collection used before repos got their own (and by the interactive CLI)
+DEFAULT_COLLECTION = "codebase"
+
+# How many extra candidates to fetch so that collapsing near-duplicates still fills top_k
+DUPLICATE_OVERFETCH = 2
+# Extra factor when part of a filter can't be pushed into Chroma and is applied afterwards
+POST_FILTER_OVERFETCH = 4
+# Directory levels stored per chunk (dir_1 .. dir_N) for path prefix filters
+DIR_DEPTH = 8
+# Bumped when chunk metadata gains fields that filters rely on; stored on the collection
+CHUNK_SCHEMA = 2
+
+# Metadata copied from indexing.file_scanner.describe_file onto every chunk
+FILTER_METADATA_KEYS = ("rel_path", "ext", "dir", "top_dir", "language", "doc_type")
+
+_client = None
+_client_lock = threading.Lock()
+
+_GLOB_EXTENSION = re.compile(r"^(?:\*\*/)?\*(\.[\w]+)$")
+
+def collection_for_url(github_url: str) -> str:
+    """Stable, Chroma-safe collection name for a repo (one collection per repo)."""
+    digest = hashlib.sha1(github_url.strip().rstrip("/").lower().encode("utf-8")).hexdigest()[:16]
+    return f"repo_{digest}"
+
+def make_chunk_id(path: str, chunk_id: int) -> str:
+    return f"{path}_{chunk_id}"
+
+def scope_metadata(directory: str, dup_rel_paths: Optional[List[str]] = None) -> Dict:
+    """
+    Extra metadata that lets scope filters run inside Chroma: the chunk's directory
+    ancestry ("dir_1": "backend", "dir_2": "backend/api", ...) and the repo-relative
+    paths of its exact duplicates, which live in other files but share this record.
+    """
+    parts = directory.split("/") if directory else []
+    meta = {f"dir_{d}": "/".join(parts[:d]) for d in range(1, min(len(parts), DIR_DEPTH) + 1)}
+    dup_rel_paths = dup_rel_paths or []
+    meta["dup_rel_paths"] = "\n".join(dup_rel_paths)
+    meta["has_dups"] = len(dup_rel_paths) > 1
+    return meta
+
+def _normalize_prefix(prefix: str) -> str:
+    prefix = (prefix or "").replace(os.sep, "/")
+    if prefix.startswith("./"):
+        prefix = prefix[2:]
+    return prefix.lstrip("/")
+
+def _dir_clause(directory: str, ancestry: bool) -> Tuple[Optional[Dict], bool]:
+    """
+    Where clause selecting everything under `directory` (no trailing slash).
+    Returns (clause, exact): `exact` is False when the clause is only a superset.
+    """
+    depth = directory.count("/") + 1
+    if not ancestry:
+        return {"top_dir": directory.split("/", 1)[0]}, depth == 1
+    if depth <= DIR_DEPTH:
+        return {f"dir_{depth}": directory}, True
+    return {f"dir_{DIR_DEPTH}": "/".join(directory.split("/")[:DIR_DEPTH])}, False
+
+def build_filter(filters: Optional[Dict], ancestry: bool = True) -> Tuple[Optional[Dict], Optional[Callable[[Dict], Optional[str]]]]:
+    """
+    Translates retrieval scope filters into a Chroma `where` clause.
+
+    Supported keys: path_prefix, glob, extensions, doc_type, language, line_start, line_end.
+    path_prefix matches whole path segments: "backend" and "backend/" both mean the
+    backend directory, "backend/app.py" that one file.
+
+    Whatever Chroma can't express (general globs, paths of exact duplicates) comes back
+    as a post-filter on the result metadata. It returns the path to cite (the duplicate's
+    path when only a duplicate is in scope) or None to drop the hit.
+    `ancestry` is False for collections built before chunks carried dir_N metadata.
+    Returns (where, post_filter).
+    """
+    if not filters:
+        return None, None
+
+    clauses = []
+    path_clauses = []
+    path_checks = []
+    # Post-filtering is needed for anything the path clauses only approximate
+    inexact = False
+
+    extensions = filters.get("extensions")
+    if extensions:
+        exts = [e.lower() if e.startswith(".") else f".{e.lower()}" for e in extensions]
+        clauses.append({"ext": {"$in": exts}})
+
+    for key in ("doc_type", "language"):
+        if filters.get(key):
+            clauses.append({key: filters[key]})
+
+    prefix = _normalize_prefix(filters.get("path_prefix"))
+    if prefix:
+        target = prefix.rstrip("/")
+        path_checks.append(lambda rel, t=target: rel == t or rel.startswith(t + "/"))
+        if prefix.endswith("/"):
+            clause, exact = _dir_clause(target, ancestry)
+            path_clauses.append(clause)
+            inexact |= not exact
+        elif ancestry and target.count("/") < DIR_DEPTH:
+            # Either a directory of that name or a file at that exact path
+            path_clauses.append({"$or": [{f"dir_{target.count('/') + 1}": target}, {"rel_path": target}]})
+        else:
+            parent = target.rsplit("/", 1)[0] if "/" in target else ""
+            if parent:
+                path_clauses.append(_dir_clause(parent, ancestry)[0])
+            inexact = True
+
+    glob = filters.get("glob")
+    if glob:
+        match = _GLOB_EXTENSION.match(glob)
+        if match:
+            clauses.append({"ext": match.group(1).lower()})
+            path_checks.append(lambda rel, ext=match.group(1).lower(): rel.lower().endswith(ext))
+        else:
+            # Leading directories without wildcards narrow the search in Chroma
+            literal_dirs = []
+            for part in _normalize_prefix(glob).split("/")[:-1]:
+                if any(ch in part for ch in "*?["):
+                    break
+                literal_dirs.append(part)
+            if literal_dirs:
+                path_clauses.append(_dir_clause("/".join(literal_dirs), ancestry)[0])
+            # Same rules as the scanner's .gitignore matching: '*' stays inside one
+            # segment, '**/' also matches no directory, a slash-less glob matches names
+            rule = PatternRule("", glob + "**" if glob.endswith("/") else glob, True)
+            path_checks.append(lambda rel, r=rule: r.matches(rel, is_dir=False))
+            inexact = True
+
+    if path_clauses:
+        own_path = path_clauses[0] if len(path_clauses) == 1 else {"$and": path_clauses}
+        if ancestry:
+            # Records with exact duplicates may be in scope through another file's path
+            alternatives = own_path["$or"] if "$or" in own_path else [own_path]
+            own_path = {"$or": alternatives + [{"has_dups": True}]}
+        clauses.append(own_path)
+
+    # Chunks overlapping [line_start, line_end]
+    if filters.get("line_end") is not None:
+        clauses.append({"start_line": {"$lte": int(filters["line_end"])}})
+    if filters.get("line_start") is not None:
+        clauses.append({"end_line": {"$gte": int(filters["line_start"])}})
+
+    if not clauses:
+        where = None
+    elif len(clauses) == 1:
+        where = clauses[0]
+    else:
+        where = {"$and": clauses}
+
+    if not path_checks or not (inexact or ancestry):
+        return where, None
+
+    def post_filter(meta: Dict) -> Optional[str]:
+        candidates = [(meta.get("rel_path", ""), meta.get("path", ""))]
+        if meta.get("has_dups"):
+            rels = meta.get("dup_rel_paths", "").split("\n")
+            paths = meta.get("dup_paths", "").split("\n")
+            candidates += list(zip(rels, paths))
+        for rel, path in candidates:
+            if all(check(rel) for check in path_checks):
+                return path
+        return None
+
+    return where, post_filter
+
+def get_client():
+    """
+    One PersistentClient per process. Creating clients for the same path from
+    several threads at once races inside chromadb, so it's built under a lock.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # Imported here: chromadb is heavy and not every entry point needs it
+                import chromadb
+                _client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+    return _client
+
+def hnsw_metadata(settings: Dict) -> Dict:
+    """Chroma collection metadata for the HNSW part of INDEX_SETTING_DEFAULTS-style settings."""
+    return {
+        "hnsw:M": int(settings["hnsw_m"]),
+        "hnsw:construction_ef": int(settings["hnsw_ef_construction"]),
+        "hnsw:search_ef": int(settings["hnsw_ef_search"]),
+    }
+
+class CollectionGoneError(Exception):
+    """The collection a store points at was dropped (e.g. retired after a newer publish)."""
+
+def _is_missing_collection(error: Exception) -> bool:
+    # chromadb.errors.NotFoundError in 1.x; older releases raised ValueError / InvalidCollectionException
+    names = {cls.__name__ for cls in type(error).__mro__}
+    return bool(names & {"NotFoundError", "InvalidCollectionException"}) or "does not exist" in str(error)
+
+def collection_names(prefix: str) -> List[str]:
+    """`prefix` and every `prefix_*` collection: a repo's live index and its builds."""
+    names = []
+    for collection in get_client().list_collections():
+        name = getattr(collection, "name", collection)
+        if name == prefix or name.startswith(prefix + "_"):
+            names.append(name)
+    return names
+
+def retire_collections(catalog, prefix: str, keep: str):
+    """
+    Marks every collection of `prefix` except `keep` as retired in the catalog
+    (the index a publish replaced, abandoned staging builds) instead of dropping
+    it, so requests that still hold the old collection finish normally. Drops
+    whatever was retired longer than the grace period ago.
+    """
+    catalog.retire_collections([name for name in collection_names(prefix) if name != keep], keep=keep)
+    drop_retired_collections(catalog)
+
+def drop_retired_collections(catalog, grace_seconds: float = RETIRED_COLLECTION_GRACE_SECONDS):
+    client = get_client()
+    existing = {getattr(c, "name", c) for c in client.list_collections()}
+    for name in catalog.expired_collections(grace_seconds):
+        if name in existing:
+            try:
+                client.delete_collection(name)
+                print(f"Dropped retired collection {name}.")
+            except Exception as e:
+                # Another process dropped it first
+                if not _is_missing_collection(e):
+                    raise
+        catalog.forget_retired(name)
 
 class VectorStore:
-    def __init__(self):
-        # Initialize Persistent Client
-        self.client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
+    def __init__(self, collection_name: str = DEFAULT_COLLECTION, hnsw: Optional[Dict] = None, client=None):
+        """
+        `hnsw` (see hnsw_metadata) only applies when the collection is created.
+        `client` defaults to the shared persistent client.
+        """
+        self.collection_name = collection_name
+        self.hnsw = hnsw or {}
+        self.client = client or get_client()
         self._init_collection()
 
     def _init_collection(self):
         """Helper to ensure collection always exists"""
         self.collection = self.client.get_or_create_collection(
-            name="codebase",
-            metadata={"hnsw:space": "cosine"}
+            name=self.collection_name,
+            metadata={"hnsw:space": "cosine", "chunk_schema": CHUNK_SCHEMA, **self.hnsw}
         )
 
+    def chunk_schema(self) -> int:
+        """CHUNK_SCHEMA the collection was created with (1 for collections that predate it)."""
+        return int((self.collection.metadata or {}).get("chunk_schema", 1))
+
+    def set_search_ef(self, ef_search: int):
+        """ef_search is the one HNSW knob that can change on a built index."""
+        self.collection.modify(configuration={"hnsw": {"ef_search": int(ef_search)}})
+
     def clear_collection(self):
         """
         Safely clears the DB.
         """
         try:
             # Try to delete if it exists
-            self.client.delete_collection("codebase")
+            self.client.delete_collection(self.collection_name)
         except ValueError:
             # "Collection not found" - that's fine, we wanted it gone anyway
             pass
@@ -42,7 +288,7 @@ class VectorStore:
         doc_texts = []
 
         for doc in documents:
-            unique_id = f"{doc['path']}_{doc['chunk_id']}"
+            unique_id = make_chunk_id(doc['path'], doc['chunk_id'])
             ids.append(unique_id)
             embeddings.append(doc['embedding'])
             doc_texts.append(doc['chunk'])
@@ -51,7 +297,13 @@ class VectorStore:
                 "path": doc['path'],
                 "chunk_id": doc['chunk_id'],
                 "start_line": doc.get("start_line", 0),
-                "end_line": doc.get("end_line", 0)
+                "end_line": doc.get("end_line", 0),
+                "page": doc.get("page", 0),  # 1-based for PDFs, 0 otherwise
+                # Near-duplicates share a group; exact copies are folded into dup_paths
+                "dup_group": doc.get("dup_group", unique_id),
+                "dup_paths": "\n".join(doc.get("dup_paths", [])),
+                **{key: doc.get(key, "") for key in FILTER_METADATA_KEYS},
+                **scope_metadata(doc.get("dir", ""), doc.get("dup_rel_paths"))
             })
 
         self.collection.add(
@@ -62,30 +314,138 @@ class VectorStore:
         )
         print(f"Added {len(documents)} chunks to ChromaDB.")
 
-    def search(self, query_vector: List[float], top_k: int = 5) -> List[Dict]:
-        try:
-            results = self.collection.query(
-                query_embeddings=[query_vector],
-                n_results=top_k,
-                include=["documents", "metadatas", "distances"]
+    def count(self) -> int:
+        return self.collection.count()
+
+    def existing_ids(self, batch_size: int = 5000) -> set:
+        """Ids already stored; a resumed build skips these."""
+        ids = set()
+        offset = 0
+        while True:
+            page = self.collection.get(limit=batch_size, offset=offset, include=[])
+            if not page["ids"]:
+                return ids
+            ids.update(page["ids"])
+            offset += len(page["ids"])
+
+    def get_vectors(self, ids: List[str]) -> Dict[str, List[float]]:
+        if not ids:
+            return {}
+        page = self.collection.get(ids=list(ids), include=["embeddings"])
+        return {rid: list(vec) for rid, vec in zip(page["ids"], page["embeddings"])}
+
+    def iter_records(self, batch_size: int = 1000):
+        """
+        Pages through the whole collection.
+        Yields dicts of parallel lists: {'ids', 'embeddings', 'documents', 'metadatas'}.
+        """
+        offset = 0
+        while True:
+            page = self.collection.get(
+                limit=batch_size,
+                offset=offset,
+                include=["embeddings", "documents", "metadatas"]
+            )
+            if not page["ids"]:
+                return
+            yield page
+            offset += len(page["ids"])
+
+    def add_records(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]):
+        """Bulk insert of already-embedded records, split to Chroma's max batch size."""
+        step = self.client.get_max_batch_size()
+        for start in range(0, len(ids), step):
+            end = start + step
+            self.collection.add(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end]
             )
 
-            formatted_results = []
-            if not results['ids'] or not results['ids'][0]:
-                return []
-
-            for i in range(len(results['ids'][0])):
-                meta = results['metadatas'][0][i]
-                formatted_results.append({
-                    "chunk": results['documents'][0][i],
-                    "path": meta["path"],
-                    "chunk_id": meta["chunk_id"],
-                    "start_line": meta.get("start_line", 0),
-                    "end_line": meta.get("end_line", 0),
-                    "distance": results['distances'][0][i]
-                })
-                
-            return formatted_results
+    def search(self, query_vector: List[float], top_k: int = 5, filters: Optional[Dict] = None) -> List[Dict]:
+        results = self.search_many([query_vector], top_k=top_k, filters=filters)
+        return results[0] if results else []
+
+    def search_many(self, query_vectors: List[List[float]], top_k: int = 5,
+                    filters: Optional[Dict] = None) -> List[List[Dict]]:
+        """
+        Runs several queries in a single Chroma call.
+        `filters` scope the search (see build_filter) and apply to every query.
+        Returns one result list per query vector, in order.
+        """
+        if not query_vectors:
+            return []
+        where, post_filter = build_filter(filters, ancestry=self.chunk_schema() >= 2)
+        n_results = top_k * DUPLICATE_OVERFETCH
+        if post_filter:
+            n_results *= POST_FILTER_OVERFETCH
+
+        found = [[] for _ in query_vectors]
+        pending = list(range(len(query_vectors)))
+        try:
+            # Collapsed duplicates and post-filtered hits can leave a query short of top_k:
+            # ask again for more candidates until it's full or Chroma has nothing left
+            while pending:
+                results = self.collection.query(
+                    query_embeddings=[query_vectors[q] for q in pending],
+                    n_results=n_results,
+                    where=where,
+                    include=["documents", "metadatas", "distances"]
+                )
+                if not results['ids']:
+                    break
+                still_short = []
+                for row, q in enumerate(pending):
+                    found[q] = self._format_results(results, row, top_k, post_filter)
+                    if len(found[q]) < top_k and len(results['ids'][row]) == n_results:
+                        still_short.append(q)
+                pending = still_short
+                n_results *= 2
+            return found
         except Exception as e:
+            if _is_missing_collection(e):
+                # The caller can re-resolve the active collection and try again
+                raise CollectionGoneError(self.collection_name) from e
             print(f"Search error: {e}")
-            return []
\ No newline at end of file
+            return found
+
+    def _format_results(self, results: Dict, q: int, top_k: int,
+                        post_filter: Optional[Callable[[Dict], Optional[str]]] = None) -> List[Dict]:
+        formatted_results = []
+        groups = {}
+        for i in range(len(results['ids'][q])):
+            meta = results['metadatas'][q][i]
+            paths = [p for p in meta.get("dup_paths", "").split("\n") if p]
+            if post_filter:
+                # Cite the copy that is in scope; dup_paths keeps the stored one in also_in
+                cited = post_filter(meta)
+                if cited is None:
+                    continue
+                if cited != meta["path"]:
+                    meta = {**meta, "path": cited}
+
+            # Collapse duplicates: keep the nearest hit, remember where else it lives
+            group = meta.get("dup_group") or results['ids'][q][i]
+            if group in groups:
+                hit = groups[group]
+                for p in paths + [meta["path"]]:
+                    if p != hit["path"] and p not in hit["also_in"]:
+                        hit["also_in"].append(p)
+                continue
+
+            hit = {
+                "id": results['ids'][q][i],
+                "chunk": results['documents'][q][i],
+                "path": meta["path"],
+                "chunk_id": meta["chunk_id"],
+                "start_line": meta.get("start_line", 0),
+                "end_line": meta.get("end_line", 0),
+                "page": meta.get("page", 0),
+                "distance": results['distances'][q][i],
+                "also_in": [p for p in paths if p != meta["path"]]
+            }
+            groups[group] = hit
+            formatted_results.append(hit)
+
+        return formatted_results[:top_k]
@@ -1,9 +1,10 @@
-import { useState, useMemo, useRef, useEffect } from "react";
+import { useState, useRef, useEffect } from "react";
 import { 
   Loader2, Database, Plus, RefreshCw, Cpu, 
   Files, ChevronDown, ChevronRight, File as FileIcon, Folder 
 } from "lucide-react";
-import { RepoStats } from "@/types";
+import { RepoStats, TreeLevel } from "@/types";
+import { api } from "@/services/api";
 import FileTree from "./FileTree"; 
 
 // --- TYPES ---
@@ -20,47 +21,69 @@ interface SidebarProps {
   setSelectedModel: (m: string) => void;
 }
 
-interface TreeNode {
-  [key: string]: TreeNode | null;
-}
+// --- HELPER COMPONENTS: LAZY FILE TREE ---
+// Each directory fetches its own level from /api/tree the first time it is opened,
+// so the tree stays complete for repos far larger than the load-repo response.
+const FileItem = ({ name, level }: { name: string, level: number }) => (
+  <div style={{ paddingLeft: `${level * 12}px` }}>
+    <div className="flex items-center gap-2 py-1.5 px-2 rounded-md text-sm select-none transition-colors hover:bg-[var(--surface-hover)] text-[var(--foreground-muted)]">
+      <span className="w-3.5 flex-shrink-0" /> {/* Spacer for alignment */}
+      <FileIcon size={14} className="text-[var(--foreground-muted)] flex-shrink-0" />
+      <span className="truncate">{name}</span>
+    </div>
+  </div>
+);
+
+const TreeLevelList = ({ tree, level }: { tree: TreeLevel, level: number }) => (
+  <div>
+    {tree.dirs.map(dir => (
+      <DirectoryItem
+        key={dir.name}
+        name={dir.name}
+        prefix={`${tree.prefix}${dir.name}/`}
+        filesCount={dir.files_count}
+        level={level}
+      />
+    ))}
+    {tree.files.map(file => (
+      <FileItem key={file.rel_path} name={file.rel_path.split('/').pop() || file.rel_path} level={level} />
+    ))}
+  </div>
+);
 
-// --- HELPER COMPONENT: RECURSIVE FILE ITEM ---
-const FileTreeItem = ({ name, node, level }: { name: string, node: TreeNode | null, level: number }) => {
+const DirectoryItem = ({ name, prefix, filesCount, level }: { name: string, prefix: string, filesCount: number, level: number }) => {
   const [isOpen, setIsOpen] = useState(false);
-  const isFolder = node !== null;
+  const [children, setChildren] = useState<TreeLevel | null>(null);
+  const [error, setError] = useState<string | null>(null);
+
+  const toggle = () => {
+    if (!isOpen && !children) {
+      setError(null);
+      api.listTree(prefix).then(setChildren).catch((e: Error) => setError(e.message));
+    }
+    setIsOpen(!isOpen);
+  };
 
   return (
     <div style={{ paddingLeft: `${level * 12}px` }}>
-      <div 
-        onClick={() => isFolder && setIsOpen(!isOpen)}
-        className={`
-          flex items-center gap-2 py-1.5 px-2 rounded-md text-sm cursor-pointer select-none transition-colors
-          hover:bg-[var(--surface-hover)]
-          ${!isFolder ? 'text-[var(--foreground-muted)]' : 'text-[var(--foreground)] font-medium'}
-        `}
+      <div
+        onClick={toggle}
+        className="flex items-center gap-2 py-1.5 px-2 rounded-md text-sm cursor-pointer select-none transition-colors hover:bg-[var(--surface-hover)] text-[var(--foreground)] font-medium"
       >
-        {isFolder ? (
-          isOpen ? <ChevronDown size={14} className="flex-shrink-0" /> : <ChevronRight size={14} className="flex-shrink-0" />
-        ) : (
-          <span className="w-3.5 flex-shrink-0" /> // Spacer for alignment
-        )}
-        
-        {isFolder ? (
-          <Folder size={14} className="text-blue-400 flex-shrink-0" />
-        ) : (
-          <FileIcon size={14} className="text-[var(--foreground-muted)] flex-shrink-0" />
-        )}
-        
+        {isOpen ? <ChevronDown size={14} className="flex-shrink-0" /> : <ChevronRight size={14} className="flex-shrink-0" />}
+        <Folder size={14} className="text-blue-400 flex-shrink-0" />
         <span className="truncate">{name}</span>
+        <span className="ml-auto text-xs text-[var(--foreground-muted)]">{filesCount}</span>
       </div>
-      
-      {/* Recursive rendering for children */}
-      {isFolder && isOpen && node && (
-        <div>
-          {Object.entries(node).sort(([a], [b]) => a.localeCompare(b)).map(([childName, childNode]) => (
-            <FileTreeItem key={childName} name={childName} node={childNode} level={level + 1} />
-          ))}
-        </div>
+
+      {isOpen && (
+        error ? (
+          <p className="text-xs text-red-400 p-2">{error}</p>
+        ) : children ? (
+          <TreeLevelList tree={children} level={level + 1} />
+        ) : (
+          <Loader2 size={14} className="animate-spin m-2 text-[var(--foreground-muted)]" />
+        )
       )}
     </div>
   );
@@ -95,37 +118,21 @@ export default function Sidebar({
     { id: "grok-2-latest", name: "Grok 2" },
   ];
 
-  // --- LOGIC 1: Process File Paths into Tree ---
-  const fileTree = useMemo(() => {
-    if (!repoStats?.file_paths) return {};
-    
-    const root: TreeNode = {};
-    
-    repoStats.file_paths.forEach(path => {
-      // Normalize Windows slashes
-      let cleanPath = path.replace(/\\/g, '/');
-      
-      // Split path
-      const parts = cleanPath.split('/');
-      
-      // Filter out the first 2 parts (usually 'downloaded_repos' and 'RepoName')
-      // to show a clean structure starting from the actual source root
-      const relevantParts = parts.length > 2 ? parts.slice(2) : parts;
+  // --- LOGIC 1: Root of the File Tree ---
+  // Fetched when the panel opens and dropped whenever another repo gets loaded
+  const [rootTree, setRootTree] = useState<TreeLevel | null>(null);
+  const [treeError, setTreeError] = useState<string | null>(null);
 
-      let current = root;
-      relevantParts.forEach((part, index) => {
-        if (index === relevantParts.length - 1) {
-          current[part] = null; // Mark as file (null children)
-        } else {
-          current[part] = current[part] || {}; // Create folder if missing
-          current = current[part] as TreeNode;
-        }
-      });
-    });
-
-    return root;
+  useEffect(() => {
+    setRootTree(null);
+    setTreeError(null);
   }, [repoStats]);
 
+  useEffect(() => {
+    if (!isFilesOpen || !repoLoaded || rootTree) return;
+    api.listTree("").then(setRootTree).catch((e: Error) => setTreeError(e.message));
+  }, [isFilesOpen, repoLoaded, rootTree]);
+
   // --- LOGIC 2: Auto-Resize Repo Input ---
   const adjustHeight = () => {
     const textarea = textareaRef.current;
@@ -274,10 +281,12 @@ export default function Sidebar({
                    mt-1 p-2 rounded-lg border border-[var(--border)] bg-[var(--background)] 
                    max-h-60 overflow-y-auto scrollbar-thin scrollbar-thumb-[var(--border)]
                  ">
-                   {Object.entries(fileTree).length > 0 ? (
-                     Object.entries(fileTree).map(([name, node]) => (
-                       <FileTreeItem key={name} name={name} node={node} level={0} />
-                     ))
+                   {treeError ? (
+                     <p className="text-xs text-red-400 p-2">{treeError}</p>
+                   ) : !rootTree ? (
+                     <Loader2 size={14} className="animate-spin m-2 text-[var(--foreground-muted)]" />
+                   ) : rootTree.dirs.length + rootTree.files.length > 0 ? (
+                     <TreeLevelList tree={rootTree} level={0} />
                    ) : (
                      <p className="text-xs text-[var(--foreground-muted)] p-2">No files listed.</p>
                    )}
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { RepoStats } from '@/types';
+import { RepoStats, FilePage, TreeLevel } from '@/types';
 
 const API_BASE = "http://127.0.0.1:8000/api";
 
@@ -38,5 +38,33 @@ export const api = {
       const message = error.response?.data?.detail || error.message;
       throw new Error(message);
     }
+  },
+
+  /**
+   * Pages through indexed files of the active repo, optionally under a path prefix.
+   */
+  listFiles: async (prefix: string = "", offset: number = 0, limit: number = 500): Promise<FilePage> => {
+    try {
+      const response = await axios.get<FilePage>(`${API_BASE}/files`, {
+        params: { prefix, offset, limit }
+      });
+      return response.data;
+    } catch (error: any) {
+      const message = error.response?.data?.detail || error.message;
+      throw new Error(message);
+    }
+  },
+
+  /**
+   * Returns one level of the file tree (sub-directories + files) under a prefix.
+   */
+  listTree: async (prefix: string = ""): Promise<TreeLevel> => {
+    try {
+      const response = await axios.get<TreeLevel>(`${API_BASE}/tree`, { params: { prefix } });
+      return response.data;
+    } catch (error: any) {
+      const message = error.response?.data?.detail || error.message;
+      throw new Error(message);
+    }
   }
 };
\ No newline at end of file
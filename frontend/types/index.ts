@@ -3,6 +3,28 @@ export interface RepoStats {
   chunks_count: number|string;
   summary?: string;
   file_paths?: string[];
+  file_paths_total?: number; // file_paths holds only the first page when this is larger
+}
+
+export interface IndexedFile {
+  rel_path: string;
+  path: string;
+  size: number;
+  chunk_count: number;
+  shared_chunk_count: number; // exact-duplicate chunks cited through another file's record
+}
+
+export interface FilePage {
+  total: number;
+  offset: number;
+  limit: number;
+  files: IndexedFile[];
+}
+
+export interface TreeLevel {
+  prefix: string;
+  dirs: { name: string; files_count: number }[];
+  files: IndexedFile[];
 }
 
 export interface ChatMessage {
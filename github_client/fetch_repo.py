@@ -1,9 +1,12 @@
 import os
+import base64
 import shutil
 import stat
 import time
 import zipfile
+import subprocess
 import requests
+from typing import Optional, Tuple
 from urllib.parse import urlparse
 from config.settings import REPOS_BASE_DIR, GITHUB_TOKEN
 
@@ -23,53 +26,148 @@ def _extract_repo_full_name(github_url: str) -> str:
         raise ValueError("Invalid GitHub URL")
     return f"{parts[0]}/{parts[1]}"
 
+class GitHubRateLimitError(RuntimeError):
+    """The GitHub REST API quota is used up; further calls fail until it resets."""
+
+
+def _check_rate_limit(resp: requests.Response):
+    if resp.status_code in (403, 429) and resp.headers.get("X-RateLimit-Remaining") == "0":
+        reset = resp.headers.get("X-RateLimit-Reset")
+        when = time.strftime("%H:%M:%S", time.localtime(int(reset))) if reset else "later"
+        hint = "" if GITHUB_TOKEN else " Set GITHUB_TOKEN for a higher limit."
+        raise GitHubRateLimitError(f"GitHub API rate limit reached, resets at {when}.{hint}")
+
 def get_default_branch(user: str, repo: str, headers: dict) -> str:
-    # ... (Keep existing get_default_branch logic unchanged) ...
-    # (Copy the code from previous steps or keep your existing function)
     api_url = f"https://api.github.com/repos/{user}/{repo}"
     try:
         resp = requests.get(api_url, headers=headers, timeout=10)
-        if resp.status_code == 200:
-            return resp.json().get("default_branch", "main")
-        return "main"
-    except:
+    except requests.RequestException as e:
+        print(f"Could not fetch default branch of {user}/{repo}: {e}")
         return "main"
+    _check_rate_limit(resp)
+    if resp.status_code == 200:
+        return resp.json().get("default_branch", "main")
+    return "main"
+
+def _github_headers() -> dict:
+    headers = {}
+    if GITHUB_TOKEN:
+        headers["Authorization"] = f"token {GITHUB_TOKEN}"
+        headers["Accept"] = "application/vnd.github.v3+json"
+    return headers
+
+def warn_if_no_token():
+    if not GITHUB_TOKEN:
+        print("Warning: GITHUB_TOKEN is not set. Private repos will fail and, without git, "
+              "GitHub API lookups are limited to 60 per hour.")
+
+def _ls_remote_head(user: str, repo: str) -> Optional[Tuple[str, str]]:
+    """
+    (default branch, head sha) from `git ls-remote --symref`. Goes over git's smart
+    HTTP protocol, so it doesn't count against the REST API quota. None if git fails.
+    """
+    env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+    if GITHUB_TOKEN:
+        # Passed through the environment so the token never shows up in `ps`
+        auth = base64.b64encode(f"x-access-token:{GITHUB_TOKEN}".encode("utf-8")).decode("ascii")
+        env.update(GIT_CONFIG_COUNT="1", GIT_CONFIG_KEY_0="http.https://github.com/.extraheader",
+                   GIT_CONFIG_VALUE_0=f"AUTHORIZATION: basic {auth}")
+    try:
+        proc = subprocess.run(
+            ["git", "ls-remote", "--symref", f"https://github.com/{user}/{repo}.git", "HEAD"],
+            capture_output=True, text=True, timeout=30, env=env,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if proc.returncode != 0:
+        return None
+    return _parse_ls_remote(proc.stdout)
+
+def _parse_ls_remote(output: str) -> Optional[Tuple[str, str]]:
+    # ref: refs/heads/main\tHEAD
+    # 3f2a...\tHEAD
+    branch = sha = None
+    for line in output.splitlines():
+        if line.startswith("ref: refs/heads/") and line.endswith("\tHEAD"):
+            branch = line[len("ref: refs/heads/"):-len("\tHEAD")]
+        elif line.endswith("\tHEAD"):
+            sha = line.split("\t", 1)[0]
+    return (branch, sha) if branch and sha else None
+
+def resolve_head(github_url: str) -> Tuple[str, Optional[str]]:
+    """
+    (default branch, head commit sha) of a repo, resolved once per index build.
+    Tries git first; falls back to two REST API calls. sha is None if GitHub can't tell us.
+    Raises GitHubRateLimitError when the API quota is exhausted.
+    """
+    user, repo = _extract_repo_full_name(github_url).split("/")
+    head = _ls_remote_head(user, repo)
+    if head:
+        return head
+
+    headers = _github_headers()
+    branch = get_default_branch(user, repo, headers)
+    try:
+        resp = requests.get(f"https://api.github.com/repos/{user}/{repo}/commits/{branch}", headers=headers, timeout=10)
+    except requests.RequestException as e:
+        print(f"Could not fetch commit SHA for {github_url}: {e}")
+        return branch, None
+    _check_rate_limit(resp)
+    return branch, resp.json().get("sha") if resp.status_code == 200 else None
 
-def download_repo_zip(github_url: str) -> str:
+def repo_download_paths(github_url: str) -> Tuple[str, str]:
+    """(zip_path, extract_dir) used for a repo under REPOS_BASE_DIR."""
+    user, repo = _extract_repo_full_name(github_url).split("/")
+    # Owner is part of the name so same-named repos can be downloaded side by side
+    base = os.path.join(REPOS_BASE_DIR, f"{user}_{repo}")
+    return base + ".zip", base
+
+def remove_download(github_url: str):
+    """Deletes a repo's zip and extracted tree once it has been indexed."""
+    zip_path, extract_dir = repo_download_paths(github_url)
+    if os.path.exists(extract_dir):
+        shutil.rmtree(extract_dir, onerror=remove_readonly)
+    if os.path.exists(zip_path):
+        os.remove(zip_path)
+
+def download_repo_zip(github_url: str, ref: Optional[str] = None) -> str:
+    """
+    Downloads and extracts the archive of `ref` (a commit sha or branch name).
+    Pass the sha from resolve_head so the tree matches the commit the index is
+    stamped with; without a ref the head is resolved here.
+    """
     os.makedirs(REPOS_BASE_DIR, exist_ok=True)
 
     full_name = _extract_repo_full_name(github_url)
     user, repo = full_name.split("/")
 
     # Headers setup (Keep existing)
-    headers = {}
-    if GITHUB_TOKEN:
-        headers["Authorization"] = f"token {GITHUB_TOKEN}"
-        headers["Accept"] = "application/vnd.github.v3+json"
+    headers = _github_headers()
 
-    branch = get_default_branch(user, repo, headers)
+    if not ref:
+        branch, sha = resolve_head(github_url)
+        ref = sha or branch
     
-    zip_url = f"https://github.com/{user}/{repo}/archive/refs/heads/{branch}.zip"
+    # Archive downloads are served outside the REST API and its quota
+    zip_url = f"https://github.com/{user}/{repo}/archive/{ref}.zip"
     print(f"Downloading from: {zip_url}")
     
     resp = requests.get(zip_url, headers=headers, stream=True)
     if resp.status_code != 200:
         raise RuntimeError(f"Failed to download repo. Status: {resp.status_code}")
 
-    zip_path = os.path.join(REPOS_BASE_DIR, f"{repo}.zip")
+    zip_path, extract_dir = repo_download_paths(github_url)
     with open(zip_path, "wb") as f:
         for chunk in resp.iter_content(chunk_size=8192):
             if chunk:
                 f.write(chunk)
-
-    extract_dir = os.path.join(REPOS_BASE_DIR, repo)
     
     # --- 2. ROBUST DELETION LOGIC ---
     if os.path.exists(extract_dir):
         print(f"Cleaning up old directory: {extract_dir}")
         # Try to delete. If it fails, wait 1s and try again (helps with Windows locks)
         try:
-            shutil.rmtree(extract_dir, onclick=remove_readonly)
+            shutil.rmtree(extract_dir, onerror=remove_readonly)
         except Exception:
             time.sleep(1)
             shutil.rmtree(extract_dir, onerror=remove_readonly)
@@ -0,0 +1,145 @@
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import List, Dict, Optional
+from config.settings import (
+    BATCH_DOWNLOAD_WORKERS, BATCH_CHUNK_WORKERS,
+    BATCH_REPO_WORKERS, BATCH_CHUNK_FILES,
+)
+from github_client.fetch_repo import (
+    download_repo_zip, resolve_head, remove_download, warn_if_no_token, GitHubRateLimitError,
+)
+from indexing.file_scanner import scan_repo
+from indexing.index_builder import load_and_chunk, store_chunks, publish_index
+from db.catalog import RepoCatalog
+from db.vector_store import collection_for_url
+from db.locks import repo_write_lock
+from llm.rate_limiter import get_governor
+
+# Pipeline per repo: commit check -> download (bounded) -> chunk (process pool)
+# -> embed + store (bounded by the shared "gemini-embed" governor) -> catalog.
+# Repos run on a thread pool so one repo's embedding overlaps the next one's download.
+
+
+def chunk_in_pool(pool: ProcessPoolExecutor, file_paths: List[str], repo_root: str,
+                  settings: Dict) -> List[Dict]:
+    """Reads and splits files across the process pool, keeping file order."""
+    slices = [file_paths[i:i + BATCH_CHUNK_FILES] for i in range(0, len(file_paths), BATCH_CHUNK_FILES)]
+    n = len(slices)
+    chunks = []
+    for part in pool.map(load_and_chunk, slices, [repo_root] * n,
+                         [settings["chunk_size"]] * n, [settings["chunk_overlap"]] * n):
+        chunks.extend(part)
+    return chunks
+
+
+def index_repository(url: str, catalog: RepoCatalog, pool: ProcessPoolExecutor,
+                     download_slots: threading.Semaphore, summaries: bool = True,
+                     force: bool = False) -> Dict:
+    """
+    Indexes one repo into its own collection without making it active.
+    Returns a report entry: {'url', 'status', 'commit_sha', 'files', 'chunks', 'seconds', ...}.
+    """
+    started = time.perf_counter()
+    result = {"url": url, "status": "indexed", "commit_sha": None}
+
+    # One lookup per repo: the sha decides "unchanged" and pins the download
+    branch, commit_sha = resolve_head(url)
+    result["commit_sha"] = commit_sha
+    existing = catalog.get_repo(url)
+    if (not force and commit_sha and existing and existing.get("collection")
+            and existing.get("commit_sha") == commit_sha):
+        result.update(status="unchanged", files=existing["files_count"], chunks=existing["chunks_count"])
+        result["seconds"] = round(time.perf_counter() - started, 2)
+        return result
+
+    collection = collection_for_url(url)
+    # Held from download to cleanup: the server builds into the same download
+    # directory, so only this repo's writers wait here; other repos carry on
+    with repo_write_lock(collection):
+        try:
+            with download_slots:
+                repo_root = download_repo_zip(url, ref=commit_sha or branch)
+
+            settings = catalog.get_index_settings(collection)
+            scanned = scan_repo(repo_root)
+            raw_chunks = chunk_in_pool(pool, [f["path"] for f in scanned], repo_root, settings)
+            index_stats = store_chunks(raw_chunks, collection, settings)
+
+            summary = ""
+            if summaries:
+                # Imported here: the QA stack is only needed when summaries are on
+                from qa.qa_engine import generate_repo_overview
+                summary = generate_repo_overview(index_stats["collection"])
+
+            publish_index(catalog, url, summary, scanned, index_stats, commit_sha, activate=False)
+        finally:
+            # Hundreds of extracted repos would fill the disk; the index is all we keep
+            remove_download(url)
+
+    result.update(files=len(scanned), chunks=index_stats["chunks_count"], dedup=index_stats["dedup"])
+    result["seconds"] = round(time.perf_counter() - started, 2)
+    return result
+
+
+def run_batch(urls: List[str], download_workers: int = BATCH_DOWNLOAD_WORKERS,
+              chunk_workers: int = BATCH_CHUNK_WORKERS, repo_workers: int = BATCH_REPO_WORKERS,
+              embed_concurrency: Optional[int] = None, summaries: bool = True,
+              force: bool = False, report_path: Optional[str] = None) -> Dict:
+    """
+    Indexes many repos concurrently. A failing repo is recorded and doesn't stop the rest.
+    Returns (and optionally writes as JSON) {'totals': {...}, 'repos': [...]}.
+    """
+    urls = list(dict.fromkeys(u.strip() for u in urls if u.strip()))
+    catalog = RepoCatalog()
+    warn_if_no_token()
+    if embed_concurrency:
+        # Every repo embeds through this one governor, so this caps the whole batch
+        get_governor("gemini-embed").concurrency.set_max_limit(embed_concurrency)
+
+    download_slots = threading.Semaphore(max(1, download_workers))
+    started = time.perf_counter()
+    results = []
+
+    # Each repo takes its own write lock from download to cleanup (see index_repository)
+    with ProcessPoolExecutor(max_workers=max(1, chunk_workers)) as pool, \
+            ThreadPoolExecutor(max_workers=max(1, repo_workers)) as repos:
+        futures = {
+            repos.submit(index_repository, url, catalog, pool, download_slots, summaries, force): url
+            for url in urls
+        }
+        rate_limited = None
+        for future in as_completed(futures):
+            url = futures[future]
+            if future.cancelled():
+                result = {"url": url, "status": "failed", "error": f"Skipped: {rate_limited}"}
+            else:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"url": url, "status": "failed", "error": f"{type(e).__name__}: {e}"}
+                    if isinstance(e, GitHubRateLimitError) and rate_limited is None:
+                        # Every remaining repo would fail the same way; stop starting new ones
+                        rate_limited = str(e)
+                        print(f"{e} Skipping the repos that haven't started.")
+                        for pending in futures:
+                            pending.cancel()
+            print(f"[{len(results) + 1}/{len(urls)}] {result['status']}: {url}")
+            results.append(result)
+
+    # Report in input order, not completion order
+    order = {url: i for i, url in enumerate(urls)}
+    results.sort(key=lambda r: order[r["url"]])
+    totals = {status: sum(1 for r in results if r["status"] == status)
+              for status in ("indexed", "unchanged", "failed")}
+    totals["chunks"] = sum(r.get("chunks", 0) for r in results if r["status"] == "indexed")
+    totals["seconds"] = round(time.perf_counter() - started, 2)
+    report = {"totals": totals, "repos": results}
+
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {report_path}")
+    print(f"Batch finished: {totals}")
+    return report
@@ -0,0 +1,132 @@
+import re
+import hashlib
+from functools import lru_cache
+from typing import List, Dict, Tuple
+
+# MinHash / LSH parameters.
+# 128 permutations in 16 bands of 8 rows gives an LSH candidate threshold of ~0.7 Jaccard;
+# candidates are then confirmed against NEAR_DUP_THRESHOLD.
+NUM_PERM = 128
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+SHINGLE_SIZE = 5
+NEAR_DUP_THRESHOLD = 0.9
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_WHITESPACE = re.compile(r"\s+")
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def exact_hash(text: str) -> str:
+    return hashlib.sha1(_normalize(text).encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def _permutations():
+    # numpy is imported on first use so the server doesn't load it just to start
+    import numpy as np
+    rng = np.random.RandomState(1)
+    perm_a = rng.randint(1, _MAX_HASH, size=NUM_PERM, dtype=np.uint64)
+    perm_b = rng.randint(0, _MAX_HASH, size=NUM_PERM, dtype=np.uint64)
+    return np, perm_a, perm_b
+
+
+def minhash_signature(text: str):
+    """MinHash signature (numpy uint64 array) over token shingles of the chunk."""
+    np, perm_a, perm_b = _permutations()
+    tokens = _TOKEN.findall(text)
+    if len(tokens) < SHINGLE_SIZE:
+        shingles = {" ".join(tokens)}
+    else:
+        shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles],
+        dtype=np.uint64,
+    )
+    # (a * x + b) mod p, truncated to 32 bits, for every permutation at once
+    permuted = ((np.outer(hashes, perm_a) + perm_b) % np.uint64(_MERSENNE_PRIME)) & np.uint64(_MAX_HASH)
+    return permuted.min(axis=0)
+
+
+def deduplicate_chunks(chunks: List[Dict]) -> Tuple[List[Dict], List[Dict], Dict]:
+    """
+    Splits chunks into records to store and a report of what was saved.
+
+    - Exact duplicates (same normalized text) are dropped; their path is appended
+      to the first copy's 'dup_paths' (and their rel_path to 'dup_rel_paths').
+    - Near duplicates (MinHash Jaccard >= NEAR_DUP_THRESHOLD) are kept as records
+      but get 'dup_of' set to the canonical chunk id so they can reuse its vector.
+
+    Every chunk must carry an 'id'. Returns (canonical, near_duplicates, report).
+    """
+    canonical = []
+    near_duplicates = []
+    by_hash: Dict[str, Dict] = {}
+    buckets: Dict[Tuple[int, bytes], List[int]] = {}
+    signatures: List = []
+
+    exact_count = 0
+    bytes_saved = 0
+
+    for chunk in chunks:
+        text = chunk["chunk"]
+        chunk["dup_group"] = chunk["id"]
+
+        key = exact_hash(text)
+        original = by_hash.get(key)
+        if original is not None:
+            original.setdefault("dup_paths", [original["path"]])
+            original.setdefault("dup_rel_paths", [original.get("rel_path", "")])
+            if chunk["path"] not in original["dup_paths"]:
+                original["dup_paths"].append(chunk["path"])
+                original["dup_rel_paths"].append(chunk.get("rel_path", ""))
+            exact_count += 1
+            bytes_saved += len(text.encode("utf-8"))
+            continue
+        by_hash[key] = chunk
+
+        sig = minhash_signature(text)
+        band_keys = [(b, sig[b * LSH_ROWS:(b + 1) * LSH_ROWS].tobytes()) for b in range(LSH_BANDS)]
+
+        match = None
+        seen = set()
+        for band_key in band_keys:
+            for idx in buckets.get(band_key, ()):
+                if idx in seen:
+                    continue
+                seen.add(idx)
+                if float((signatures[idx] == sig).mean()) >= NEAR_DUP_THRESHOLD:
+                    match = canonical[idx]
+                    break
+            if match is not None:
+                break
+
+        if match is not None:
+            chunk["dup_of"] = match["id"]
+            chunk["dup_group"] = match["id"]
+            near_duplicates.append(chunk)
+            bytes_saved += len(text.encode("utf-8"))
+            continue
+
+        idx = len(canonical)
+        canonical.append(chunk)
+        signatures.append(sig)
+        for band_key in band_keys:
+            buckets.setdefault(band_key, []).append(idx)
+
+    report = {
+        "chunks_total": len(chunks),
+        "chunks_embedded": len(canonical),
+        "exact_duplicates": exact_count,
+        "near_duplicates": len(near_duplicates),
+        "embedding_calls_saved": exact_count + len(near_duplicates),
+        "bytes_saved": bytes_saved,
+    }
+    return canonical, near_duplicates, report
@@ -1,5 +1,7 @@
 import os
-from typing import List
+import re
+import fnmatch
+from typing import List, Dict, Optional, Tuple
 
 # ADD .ipynb and .pdf to this list
 SUPPORTED_EXTENSIONS = [
@@ -11,22 +13,324 @@ SUPPORTED_EXTENSIONS = [
     ".ipynb", ".pdf"  # <--- NEW EXTENSIONS
 ]
 
+# Used to enrich chunk metadata so retrieval can filter by language / document type
+LANGUAGE_BY_EXTENSION = {
+    ".py": "python", ".ipynb": "python",
+    ".js": "javascript", ".ts": "typescript", ".tsx": "typescript",
+    ".java": "java", ".go": "go", ".cs": "csharp",
+    ".php": "php", ".rb": "ruby", ".rs": "rust",
+    ".cpp": "cpp", ".hpp": "cpp", ".c": "c", ".h": "c",
+    ".md": "markdown", ".rst": "restructuredtext", ".txt": "text", ".pdf": "pdf",
+    ".yaml": "yaml", ".yml": "yaml",
+}
+DOC_EXTENSIONS = {".md", ".txt", ".rst", ".pdf"}
+CONFIG_EXTENSIONS = {".yaml", ".yml"}
+
+# Directories we never descend into, even without a .gitignore
+SKIP_DIRS = {".git", "node_modules", "__pycache__", ".idea", ".vscode", "venv", "env"}
+
+# Size caps (bytes). Anything bigger is almost always generated, vendored or data.
+DEFAULT_MAX_FILE_SIZE = 512 * 1024
+EXTENSION_SIZE_LIMITS = {
+    ".yaml": 128 * 1024,
+    ".yml": 128 * 1024,
+    ".txt": 256 * 1024,
+    ".ipynb": 2 * 1024 * 1024,
+    ".pdf": 20 * 1024 * 1024,
+}
+
+# Formats that are binary by design and must not be sniffed
+BINARY_EXTENSIONS = {".pdf"}
+
+# Bytes read from the head of a file to detect binary / minified content
+SNIFF_BYTES = 8192
+# Only these are ever shipped minified; a long line in a .md or .py file is just a long line
+MINIFIABLE_EXTENSIONS = {".js", ".ts", ".tsx", ".css", ".json"}
+MINIFIED_LINE_LENGTH = 1000
+# Share of the sniffed bytes that must sit on lines longer than MINIFIED_LINE_LENGTH
+MINIFIED_LONG_LINE_SHARE = 0.5
+MINIFIED_NAME_PATTERN = re.compile(r"[.-](min|bundle)\.(js|css|ts)$", re.IGNORECASE)
+
+
 def is_supported_file(filename: str) -> bool:
     _, ext = os.path.splitext(filename)
     return ext.lower() in SUPPORTED_EXTENSIONS
 
+
+def describe_file(rel_path: str) -> Dict[str, str]:
+    """
+    Filterable attributes of a repo-relative path.
+    Returns {'rel_path', 'ext', 'dir', 'top_dir', 'language', 'doc_type'}.
+    """
+    rel_path = rel_path.replace(os.sep, "/")
+    if rel_path.startswith("./"):
+        rel_path = rel_path[2:]
+    ext = os.path.splitext(rel_path)[1].lower()
+    directory = rel_path.rsplit("/", 1)[0] if "/" in rel_path else ""
+    if ext in DOC_EXTENSIONS:
+        doc_type = "doc"
+    elif ext in CONFIG_EXTENSIONS:
+        doc_type = "config"
+    else:
+        doc_type = "code"
+    return {
+        "rel_path": rel_path,
+        "ext": ext,
+        "dir": directory,
+        "top_dir": directory.split("/", 1)[0],
+        "language": LANGUAGE_BY_EXTENSION.get(ext, "unknown"),
+        "doc_type": doc_type,
+    }
+
+
+# --- .gitignore / .gitattributes matching ---
+
+class PatternRule:
+    """One line of a .gitignore or .gitattributes file, relative to the directory it lives in."""
+
+    def __init__(self, base: str, pattern: str, value: bool, attr: Optional[str] = None):
+        self.base = base  # repo-relative dir of the file that defined the rule ("" for root)
+        self.value = value
+        self.attr = attr  # .gitattributes only: which attribute the rule sets
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        # A slash anywhere except the end anchors the pattern to `base`
+        self.anchored = "/" in pattern
+        self.pattern = pattern.lstrip("/")
+        self.regex = re.compile(_glob_to_regex(self.pattern))
+
+    def matches(self, rel_path: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return False
+            rel_path = rel_path[len(self.base) + 1:]
+        if self.anchored:
+            return self.regex.fullmatch(rel_path) is not None
+        return self.regex.fullmatch(rel_path.rsplit("/", 1)[-1]) is not None
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translates a gitignore glob (with ** support) into a regex."""
+    i, n = 0, len(pattern)
+    out = []
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern[i:i + 3] == "**/":
+                out.append("(?:.*/)?")
+                i += 3
+                continue
+            if pattern[i:i + 2] == "**":
+                out.append(".*")
+                i += 2
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = pattern.find("]", i + 1)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                out.append(fnmatch.translate(pattern[i:j + 1])[4:-3])
+                i = j
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def parse_gitignore(path: str, base: str) -> List[PatternRule]:
+    rules = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                line = line.rstrip("\n").rstrip()
+                if not line or line.startswith("#"):
+                    continue
+                negate = line.startswith("!")
+                if negate:
+                    line = line[1:]
+                elif line.startswith("\\"):
+                    line = line[1:]
+                if line:
+                    rules.append(PatternRule(base, line, not negate))
+    except OSError:
+        pass
+    return rules
+
+
+def parse_gitattributes(path: str, base: str) -> List[PatternRule]:
+    """
+    Only the linguist-generated / linguist-vendored attributes matter to us.
+    Each rule keeps its attribute name so the two are resolved independently.
+    """
+    rules = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                parts = line.split()
+                if not parts or parts[0].startswith("#"):
+                    continue
+                pattern, attrs = parts[0], parts[1:]
+                for attr in attrs:
+                    name = attr.lstrip("-!").split("=", 1)[0]
+                    if name not in ("linguist-generated", "linguist-vendored"):
+                        continue
+                    value = not attr.startswith(("-", "!")) and not attr.endswith("=false")
+                    rules.append(PatternRule(base, pattern, value, attr=name))
+    except OSError:
+        pass
+    return rules
+
+
+def _last_match(rules: List[PatternRule], rel_path: str, is_dir: bool,
+                attr: Optional[str] = None) -> Optional[bool]:
+    # Later rules win, so walk backwards and stop at the first hit
+    for rule in reversed(rules):
+        if attr is not None and rule.attr != attr:
+            continue
+        if rule.matches(rel_path, is_dir):
+            return rule.value
+    return None
+
+
+def _linguist_skip(rules: List[PatternRule], rel_path: str, is_dir: bool) -> Optional[str]:
+    """Skip reason ("generated", "vendored") from .gitattributes, or None."""
+    if not rules:
+        return None
+    if _last_match(rules, rel_path, is_dir, "linguist-generated"):
+        return "generated"
+    if _last_match(rules, rel_path, is_dir, "linguist-vendored"):
+        return "vendored"
+    return None
+
+
+# --- Content sniffing ---
+
+def sniff_file(path: str, ext: str) -> Optional[str]:
+    """
+    Looks at the first bytes of a file.
+    Returns a skip reason ("binary", "minified") or None if the file looks like source.
+    """
+    if ext in BINARY_EXTENSIONS:
+        return None
+    try:
+        with open(path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+    except OSError:
+        return "unreadable"
+
+    if b"\x00" in head:
+        return "binary"
+
+    # Minified bundles: most of the content sits on a few very long lines.
+    # One long line (an embedded data URI, a long string) is not enough.
+    if ext in MINIFIABLE_EXTENSIONS and len(head) >= SNIFF_BYTES // 2:
+        long_bytes = sum(len(line) for line in head.split(b"\n") if len(line) >= MINIFIED_LINE_LENGTH)
+        if long_bytes >= len(head) * MINIFIED_LONG_LINE_SHARE:
+            return "minified"
+    return None
+
+
+def _size_limit(ext: str) -> int:
+    return EXTENSION_SIZE_LIMITS.get(ext, DEFAULT_MAX_FILE_SIZE)
+
+
+# --- Scanner ---
+
+def scan_repo(repo_root: str, stats: Optional[Dict[str, int]] = None) -> List[Dict]:
+    """
+    Walks the repo with os.scandir, honouring .gitignore and .gitattributes.
+    Returns list of dicts: {'path', 'rel_path', 'size', 'mtime'} for files worth indexing.
+    If `stats` is given, it is filled with skip counters per reason.
+    """
+    if stats is None:
+        stats = {}
+    results = []
+
+    # Each stack entry carries the rules inherited from parent directories
+    stack: List[Tuple[str, str, List[PatternRule], List[PatternRule]]] = [(repo_root, "", [], [])]
+
+    while stack:
+        dir_path, rel_dir, ignore_rules, attr_rules = stack.pop()
+
+        try:
+            entries = list(os.scandir(dir_path))
+        except OSError as e:
+            print(f"Warning: cannot read {dir_path}: {e}")
+            continue
+
+        names = {entry.name for entry in entries}
+        if ".gitignore" in names:
+            ignore_rules = ignore_rules + parse_gitignore(os.path.join(dir_path, ".gitignore"), rel_dir)
+        if ".gitattributes" in names:
+            attr_rules = attr_rules + parse_gitattributes(os.path.join(dir_path, ".gitattributes"), rel_dir)
+
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+
+            if is_dir:
+                if entry.name in SKIP_DIRS:
+                    continue
+                if _last_match(ignore_rules, rel_path, True):
+                    stats["gitignored"] = stats.get("gitignored", 0) + 1
+                    continue
+                reason = _linguist_skip(attr_rules, rel_path, True)
+                if reason:
+                    stats[reason] = stats.get(reason, 0) + 1
+                    continue
+                stack.append((entry.path, rel_path, ignore_rules, attr_rules))
+                continue
+
+            if not entry.is_file(follow_symlinks=False) or not is_supported_file(entry.name):
+                continue
+
+            if _last_match(ignore_rules, rel_path, False):
+                stats["gitignored"] = stats.get("gitignored", 0) + 1
+                continue
+            reason = _linguist_skip(attr_rules, rel_path, False)
+            if reason:
+                stats[reason] = stats.get(reason, 0) + 1
+                continue
+
+            ext = os.path.splitext(entry.name)[1].lower()
+            if MINIFIED_NAME_PATTERN.search(entry.name):
+                stats["minified"] = stats.get("minified", 0) + 1
+                continue
+
+            st = entry.stat(follow_symlinks=False)
+            if st.st_size == 0:
+                continue
+            if st.st_size > _size_limit(ext):
+                stats["too_large"] = stats.get("too_large", 0) + 1
+                continue
+
+            reason = sniff_file(entry.path, ext)
+            if reason:
+                stats[reason] = stats.get(reason, 0) + 1
+                continue
+
+            results.append({
+                "path": entry.path,
+                "rel_path": rel_path,
+                "size": st.st_size,
+                "mtime": st.st_mtime,
+            })
+
+    results.sort(key=lambda f: f["rel_path"])
+    return results
+
+
 def scan_repo_files(repo_root: str) -> List[str]:
     """
     Return list of absolute paths of supported files in repo.
     """
-    file_paths = []
-    for root, dirs, files in os.walk(repo_root):
-        # Skip hidden/system directories
-        dirs[:] = [
-            d for d in dirs
-            if d not in (".git", "node_modules", "__pycache__", ".idea", ".vscode", "venv", "env")
-        ]
-        for fn in files:
-            if is_supported_file(fn):
-                file_paths.append(os.path.join(root, fn))
-    return file_paths
\ No newline at end of file
+    return [f["path"] for f in scan_repo(repo_root)]
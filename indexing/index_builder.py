@@ -1,12 +1,18 @@
-import time
 import os
 import json      # For parsing .ipynb
-from pypdf import PdfReader # For parsing .pdf
-from typing import List, Dict
-from config.settings import CHUNK_SIZE
-from llm.gemini_client import get_embedding
-from db.vector_store import VectorStore
+import hashlib
+from typing import List, Dict, Optional
+from config.settings import CHUNK_SIZE, CHUNK_OVERLAP, EMBED_BATCH_SIZE, EMBEDDING_MODEL
+from llm.gemini_client import get_embeddings
+from db.vector_store import (
+    VectorStore, make_chunk_id, DEFAULT_COLLECTION, collection_for_url, retire_collections, hnsw_metadata,
+    CHUNK_SCHEMA,
+)
+from db.catalog import RepoCatalog
 from indexing.smart_splitter import smart_chunk_code
+from indexing.dedup import deduplicate_chunks
+from indexing.file_scanner import describe_file
+from indexing.pdf_extractor import extract_pdf_pages
 
 # --- NEW: Specialized Loaders ---
 
@@ -34,19 +40,17 @@ def load_ipynb_content(path: str) -> str:
         print(f"Error parsing .ipynb {path}: {e}")
         return ""
 
-def load_pdf_content(path: str) -> str:
-    """Extracts text from a PDF file."""
+def load_pdf_pages(path: str) -> List[Dict]:
+    """Extracts a PDF page by page (cached, capped by PDF_MAX_PAGES): [{'page', 'text'}]."""
     try:
-        reader = PdfReader(path)
-        text_content = []
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                text_content.append(text)
-        return "\n".join(text_content)
+        return extract_pdf_pages(path)
     except Exception as e:
         print(f"Error parsing PDF {path}: {e}")
-        return ""
+        return []
+
+def load_pdf_content(path: str) -> str:
+    """Extracts text from a PDF file."""
+    return "\n".join(p["text"] for p in load_pdf_pages(path))
 
 # --- Updated General Loader ---
 
@@ -73,56 +77,216 @@ def load_file_content(path: str) -> str:
 def make_documents(file_paths: List[str]) -> List[Dict]:
     docs = []
     for path in file_paths:
+        if path.lower().endswith(".pdf"):
+            # Kept as pages so chunks can cite them
+            pages = load_pdf_pages(path)
+            if pages:
+                docs.append({"path": path, "pages": pages})
+            continue
         content = load_file_content(path)
         if not content.strip():
             continue
         docs.append({"path": path, "content": content})
     return docs
 
-def build_index(documents: List[Dict]):
-    store = VectorStore()
-    store.clear_collection()
-    
+def chunk_documents(documents: List[Dict], repo_root: Optional[str] = None,
+                    chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[Dict]:
+    """
+    Runs the smart splitter over every document.
+    Returns flat list of chunk dicts ready for dedup and embedding, each carrying
+    the filterable file attributes from describe_file (paths relative to repo_root).
+    """
     raw_chunks = []
     
     for doc in documents:
-        text = doc["content"]
         path = doc["path"]
         _, ext = os.path.splitext(path)
+        file_attrs = describe_file(os.path.relpath(path, repo_root) if repo_root else path)
+
+        # PDFs are split page by page; line numbers are then relative to the page
+        pages = doc.get("pages") or [{"page": 0, "text": doc["content"]}]
         
-        # 1. Get structured chunks (dict) instead of strings
-        chunks_data = smart_chunk_code(text, ext, CHUNK_SIZE)
-        
-        for i, data in enumerate(chunks_data):
-            raw_chunks.append({
-                "path": path,
-                "chunk_id": i,
-                "chunk": data["text"],
-                # 2. Save Line Metadata
-                "start_line": data["start_line"],
-                "end_line": data["end_line"]
-            })
+        i = 0
+        for page in pages:
+            # 1. Get structured chunks (dict) instead of strings
+            for data in smart_chunk_code(page["text"], ext, chunk_size, overlap):
+                raw_chunks.append({
+                    "id": make_chunk_id(path, i),
+                    "path": path,
+                    "chunk_id": i,
+                    "chunk": data["text"],
+                    # 2. Save Line Metadata
+                    "start_line": data["start_line"],
+                    "end_line": data["end_line"],
+                    "page": page["page"],
+                    **file_attrs
+                })
+                i += 1
+    return raw_chunks
+
+def load_and_chunk(file_paths: List[str], repo_root: Optional[str] = None,
+                   chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[Dict]:
+    """
+    Reads and splits files in one go. Top-level and pure, so it can run in a process pool.
+    """
+    return chunk_documents(make_documents(file_paths), repo_root, chunk_size, overlap)
+
+def build_index(documents: List[Dict], repo_root: Optional[str] = None,
+                collection_name: str = DEFAULT_COLLECTION) -> Dict:
+    """
+    Chunks, deduplicates, embeds and stores documents into a staging collection.
+    Returns {'collection': staging name, 'chunks_count': int, 'chunks_per_file': {path: int},
+    'shared_per_file': {path: int}, 'dedup': report}.
+    Nothing serves from it until publish_index swaps it in.
+    Chunking and HNSW settings come from the catalog's settings for `collection_name`.
+    """
+    settings = RepoCatalog().get_index_settings(collection_name)
+    raw_chunks = chunk_documents(documents, repo_root, settings["chunk_size"], settings["chunk_overlap"])
+    return store_chunks(raw_chunks, collection_name, settings)
+
+def index_fingerprint(raw_chunks: List[Dict], hnsw: Optional[Dict] = None) -> str:
+    """
+    Identifies a build by its chunk ids and texts (and the embedding model,
+    HNSW graph settings and chunk metadata schema). ef_search is left out:
+    it can change on a built index, and publish_index applies the stored value.
+    """
+    graph = {key: value for key, value in (hnsw or {}).items() if key != "hnsw:search_ef"}
+    h = hashlib.sha1(f"{EMBEDDING_MODEL}\0{CHUNK_SCHEMA}".encode("utf-8"))
+    h.update(json.dumps(graph, sort_keys=True).encode("utf-8"))
+    for item in raw_chunks:
+        h.update(b"\0" + item["id"].encode("utf-8") + b"\0" + item["chunk"].encode("utf-8"))
+    return h.hexdigest()
+
+def staging_collection_name(collection_name: str, fingerprint: str) -> str:
+    return f"{collection_name}_{fingerprint[:12]}"
+
+def store_chunks(raw_chunks: List[Dict], collection_name: str = DEFAULT_COLLECTION,
+                 settings: Optional[Dict] = None) -> Dict:
+    """
+    Deduplicates, embeds and stores already-split chunks. Same return value as build_index.
+
+    Records go to a staging collection named after the build's fingerprint and
+    every embedded batch is written as soon as it's ready. Those stored ids are
+    the checkpoint: rerunning the same build after a crash skips them and
+    embeds only the rest.
+    """
+    catalog = RepoCatalog()
+    settings = settings or catalog.get_index_settings(collection_name)
+    hnsw = hnsw_metadata(settings)
+    staging = staging_collection_name(collection_name, index_fingerprint(raw_chunks, hnsw))
+    # A build identical to a retired one resumes into it; keep other repos' publishes from dropping it
+    catalog.forget_retired(staging)
+    store = VectorStore(staging, hnsw=hnsw)
+    done_ids = store.existing_ids()
+    
+    chunks_per_file = {}
+    for item in raw_chunks:
+        chunks_per_file[item["path"]] = chunks_per_file.get(item["path"], 0) + 1
 
     total_chunks = len(raw_chunks)
-    print(f"Generated {total_chunks} smart chunks. Starting embedding generation...")
+    unique_chunks, near_duplicates, dedup_report = deduplicate_chunks(raw_chunks)
+    print(f"Generated {total_chunks} smart chunks. "
+          f"Skipping {dedup_report['embedding_calls_saved']} duplicates "
+          f"({dedup_report['bytes_saved']} bytes). Starting embedding generation...")
+    if done_ids:
+        print(f"Resuming build {staging}: {len(done_ids)} records already stored.")
 
-    batch = []
-    for i, item in enumerate(raw_chunks):
-        if i % 10 == 0:
-            print(f"Processing chunk {i}/{total_chunks}...")
-        
-        vector = get_embedding(item["chunk"])
-        if vector:
+    # Exact duplicates get no record of their own: their file is cited through the
+    # dup_paths of the copy that was kept, and the catalog counts them per file
+    stored_ids = {item["id"] for item in unique_chunks} | {item["id"] for item in near_duplicates}
+    shared_per_file = {}
+    for item in raw_chunks:
+        if item["id"] not in stored_ids:
+            shared_per_file[item["path"]] = shared_per_file.get(item["path"], 0) + 1
+
+    # Only keep vectors that near-duplicates will reuse
+    reused_ids = {item["dup_of"] for item in near_duplicates}
+    reused_vectors = {}
+
+    # The rate governor paces these calls; no fixed sleeps needed
+    pending = [item for item in unique_chunks if item["id"] not in done_ids]
+    for start in range(0, len(pending), EMBED_BATCH_SIZE):
+        group = pending[start:start + EMBED_BATCH_SIZE]
+        print(f"Processing chunk {start}/{len(pending)}...")
+
+        vectors = get_embeddings([item["chunk"] for item in group])
+        batch = []
+        for item, vector in zip(group, vectors):
+            if not vector:
+                continue
             item["embedding"] = vector
             batch.append(item)
-        
+            if item["id"] in reused_ids:
+                reused_vectors[item["id"]] = vector
+        # Checkpoint: this batch survives a crash of anything after it
+        store.add_documents(batch)
+
+    near_pending = [item for item in near_duplicates if item["id"] not in done_ids]
+    # Canonical vectors stored by an earlier, interrupted run
+    missing = {item["dup_of"] for item in near_pending} - reused_vectors.keys()
+    reused_vectors.update(store.get_vectors(sorted(missing)))
+
+    batch = []
+    orphans = []
+    for item in near_pending:
+        vector = reused_vectors.get(item["dup_of"])
+        if vector is None:
+            # The canonical chunk failed to embed; don't lose this one with it
+            orphans.append(item)
+            continue
+        item["embedding"] = vector
+        batch.append(item)
         if len(batch) >= 50:
             store.add_documents(batch)
             batch = []
-        
-        time.sleep(0.1) 
 
     if batch:
         store.add_documents(batch)
 
-    print("Indexing to ChromaDB complete.")
\ No newline at end of file
+    if orphans:
+        print(f"Embedding {len(orphans)} near-duplicates whose canonical chunk has no vector...")
+        # They cost an embedding call after all
+        dedup_report["chunks_embedded"] += len(orphans)
+        dedup_report["embedding_calls_saved"] -= len(orphans)
+        dedup_report["bytes_saved"] -= sum(len(item["chunk"].encode("utf-8")) for item in orphans)
+    for start in range(0, len(orphans), EMBED_BATCH_SIZE):
+        group = orphans[start:start + EMBED_BATCH_SIZE]
+        vectors = get_embeddings([item["chunk"] for item in group])
+        batch = []
+        for item, vector in zip(group, vectors):
+            if vector:
+                item["embedding"] = vector
+                batch.append(item)
+        store.add_documents(batch)
+
+    print(f"Indexing to ChromaDB complete ({staging}). Dedup report: {dedup_report}")
+    return {"collection": staging, "chunks_count": total_chunks, "chunks_per_file": chunks_per_file,
+            "shared_per_file": shared_per_file, "dedup": dedup_report}
+
+def publish_index(catalog: RepoCatalog, url: str, summary: str, files: List[Dict], index_stats: Dict,
+                  commit_sha: Optional[str] = None, activate: bool = True) -> int:
+    """
+    Swaps a finished build in: the catalog's collection pointer for `url` moves to
+    the staging collection in one transaction. The replaced collection (and any
+    abandoned staging builds of this repo) are only retired; they are dropped by
+    a later publish once RETIRED_COLLECTION_GRACE_SECONDS have passed, so chats
+    already searching them finish normally. The repo's stored ef_search is
+    applied to the new collection first. Returns the repo id.
+    """
+    # Tuned after the build started (benchmarks/tune_retrieval.py) or resumed from an older build
+    ef_search = catalog.get_index_settings(collection_for_url(url))["hnsw_ef_search"]
+    VectorStore(index_stats["collection"]).set_search_ef(ef_search)
+    repo_id = catalog.save_repo(
+        url,
+        summary,
+        files,
+        chunk_counts=index_stats.get("chunks_per_file"),
+        chunks_count=index_stats.get("chunks_count", 0),
+        dedup=index_stats.get("dedup"),
+        commit_sha=commit_sha,
+        collection=index_stats["collection"],
+        activate=activate,
+        shared_counts=index_stats.get("shared_per_file"),
+    )
+    retire_collections(catalog, collection_for_url(url), keep=index_stats["collection"])
+    return repo_id
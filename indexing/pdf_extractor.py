@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import List, Dict
+from config.settings import (
+    PDF_CACHE_DIR, PDF_MAX_PAGES, PDF_PAGE_MODE, PDF_CACHE_MAX_MB, PDF_CACHE_MAX_AGE_DAYS,
+)
+
+# Extracted page texts are cached as PDF_CACHE_DIR/<sha1 of file>.json:
+#   {"page_count": int, "pages": {"<page number>": text}}
+# Only the pages a run asked for are stored, so changing the cap or mode
+# later extracts just the pages that weren't needed before.
+# A file's mtime is its last use: reads touch it, and prune_cache() drops the
+# least recently used entries once the cache outgrows PDF_CACHE_MAX_MB.
+
+# Pruning lists the whole directory, so a process does it at most this often
+PRUNE_INTERVAL = 60.0  # seconds
+_last_prune = {"at": float("-inf")}
+_prune_lock = threading.Lock()
+
+
+def file_sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def select_pages(page_count: int, max_pages: int = PDF_MAX_PAGES, mode: str = PDF_PAGE_MODE) -> List[int]:
+    """
+    0-based page indexes to extract.
+    "head" keeps the first `max_pages`; "sample" spreads them evenly over the
+    document (always including the first and last page). max_pages <= 0 means all.
+    """
+    if max_pages <= 0 or page_count <= max_pages:
+        return list(range(page_count))
+    if mode == "sample" and max_pages > 1:
+        step = (page_count - 1) / (max_pages - 1)
+        return sorted({round(i * step) for i in range(max_pages)})
+    return list(range(max_pages))
+
+
+def _cache_path(digest: str) -> str:
+    return os.path.join(PDF_CACHE_DIR, f"{digest}.json")
+
+
+def _read_cache(digest: str) -> Dict:
+    try:
+        with open(_cache_path(digest), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        os.utime(_cache_path(digest))
+        return entry
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(digest: str, entry: Dict):
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    # Write-then-rename so parallel indexers never read a half-written file.
+    # Named per thread too: two builds in one server can extract the same PDF at once.
+    tmp_path = f"{_cache_path(digest)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, _cache_path(digest))
+    _maybe_prune()
+
+
+def _maybe_prune():
+    with _prune_lock:
+        now = time.monotonic()
+        if now - _last_prune["at"] < PRUNE_INTERVAL:
+            return
+        _last_prune["at"] = now
+    prune_cache()
+
+
+def prune_cache(max_mb: int = PDF_CACHE_MAX_MB, max_age_days: float = PDF_CACHE_MAX_AGE_DAYS) -> int:
+    """
+    Deletes entries unused for `max_age_days`, then the least recently used ones
+    until the cache fits in `max_mb`. Returns the number of files removed.
+    """
+    try:
+        entries = []
+        for entry in os.scandir(PDF_CACHE_DIR):
+            if entry.is_file():
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    except OSError:
+        return 0
+
+    now = time.time()
+    entries.sort()  # Oldest first
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for mtime, size, path in entries:
+        too_old = max_age_days > 0 and now - mtime > max_age_days * 86400
+        # Leftover .tmp files from a crashed writer count as old after an hour
+        stale_tmp = path.endswith(".tmp") and now - mtime > 3600
+        if not (too_old or stale_tmp or total > max_mb * 1024 * 1024):
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    if removed:
+        print(f"PDF cache: removed {removed} entries, {total // (1024 * 1024)} MB left.")
+    return removed
+
+
+def extract_pdf_pages(path: str, max_pages: int = PDF_MAX_PAGES, mode: str = PDF_PAGE_MODE) -> List[Dict]:
+    """
+    Text of the selected pages as [{'page': 1-based number, 'text': str}], skipping empty pages.
+    Pages already in the cache are not parsed again.
+    """
+    digest = file_sha1(path)
+    entry = _read_cache(digest)
+    cached = entry.get("pages", {})
+
+    reader = None
+    page_count = entry.get("page_count")
+    if page_count is None:
+        from pypdf import PdfReader  # Only repos with PDFs pay for this import
+        reader = PdfReader(path)
+        page_count = len(reader.pages)
+
+    wanted = select_pages(page_count, max_pages, mode)
+    missing = [i for i in wanted if str(i + 1) not in cached]
+    if missing:
+        if reader is None:
+            from pypdf import PdfReader
+            reader = PdfReader(path)
+        for i in missing:
+            try:
+                cached[str(i + 1)] = reader.pages[i].extract_text() or ""
+            except Exception as e:
+                print(f"Error extracting page {i + 1} of {path}: {e}")
+                cached[str(i + 1)] = ""
+        _write_cache(digest, {"page_count": page_count, "pages": cached})
+
+    if len(wanted) < page_count:
+        print(f"{path}: indexing {len(wanted)} of {page_count} pages ({mode}).")
+
+    return [{"page": i + 1, "text": cached[str(i + 1)]} for i in wanted if cached[str(i + 1)].strip()]
@@ -80,9 +80,10 @@ def naive_chunk_with_lines(text: str, start_line: int, chunk_size: int, overlap:
 
     return chunks
 
-def smart_chunk_code(text: str, ext: str, chunk_size: int = 1000) -> List[Dict[str, Any]]:
+def smart_chunk_code(text: str, ext: str, chunk_size: int = 1000, overlap: int = 100) -> List[Dict[str, Any]]:
     """
     Splits code and tracks line numbers.
+    `overlap` chars are repeated between the pieces of a block too big for one chunk.
     Returns list of dicts: {'text': str, 'start_line': int, 'end_line': int}
     """
     config = LANGUAGE_PATTERNS.get(ext.lower(), DEFAULT_PATTERN)
@@ -125,7 +126,9 @@ def smart_chunk_code(text: str, ext: str, chunk_size: int = 1000) -> List[Dict[s
             # 2. Handle the NEW block
             # If the block itself is huge, split it naively
             if block_len + context_len > chunk_size:
-                sub_chunks = naive_chunk_with_lines(block, current_line, chunk_size - context_len, 100)
+                piece_size = max(1, chunk_size - context_len)
+                # Overlap must leave room to advance, or the naive splitter never ends
+                sub_chunks = naive_chunk_with_lines(block, current_line, piece_size, min(overlap, piece_size // 2))
                 for sub in sub_chunks:
                     final_chunks.append({
                         "text": f"{file_context}\n\n...[Large Block Split]...\n\n{sub['text']}",
@@ -1,52 +1,78 @@
-import google.generativeai as genai
-import time
-from config.settings import GEMINI_API_KEY, GENERATION_MODEL, EMBEDDING_MODEL
-from config.settings import DEFAULT_MODEL
+from config.settings import EMBEDDING_MODEL
+from config.settings import DEFAULT_MODEL, EMBED_BATCH_SIZE
+from llm.providers import get_genai, ProviderConfigError
+from llm.rate_limiter import get_governor, estimate_tokens, RateLimitError
 
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY is not set")
-
-genai.configure(api_key=GEMINI_API_KEY)
+# google.generativeai is imported (and GEMINI_API_KEY checked) on the first call, not here.
 
 def ask_gemini(system_prompt: str, user_prompt: str, model_name: str = DEFAULT_MODEL) -> str:
     try:
         # Use the requested model
-        model = genai.GenerativeModel(model_name)
+        model = get_genai().GenerativeModel(model_name)
         full_prompt = f"{system_prompt}\n\n{user_prompt}"
-        response = model.generate_content(full_prompt)
+        response = get_governor("gemini").call(
+            model.generate_content, full_prompt, tokens=estimate_tokens(full_prompt)
+        )
         return response.text
     except Exception as e:
         return f"Error communicating with Gemini ({model_name}): {str(e)}"
-    
+
 def get_embedding(text: str) -> list:
     """
     Generates a vector embedding for a given text.
-    Includes a retry mechanism and rate limit handling.
+    Rate limits are retried by the shared governor; if the quota never frees up
+    RateLimitError is raised instead of silently dropping the chunk.
     """
-    retries = 3
-    for attempt in range(retries):
+    try:
+        result = get_governor("gemini-embed").call(
+            get_genai().embed_content,
+            tokens=estimate_tokens(text),
+            model=EMBEDDING_MODEL,
+            content=text,
+            task_type="retrieval_document",
+            title="Code Snippet"
+        )
+        return result['embedding']
+    except (RateLimitError, ProviderConfigError):
+        raise
+    except Exception as e:
+        print(f"Error generating embedding: {e}")
+        return []
+
+def get_embeddings(texts: list) -> list:
+    """
+    Embeds many document chunks with batched requests (EMBED_BATCH_SIZE per call).
+    Returns one vector per text, in order; texts that fail on their own get [].
+    """
+    vectors = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        batch = texts[start:start + EMBED_BATCH_SIZE]
         try:
-            result = genai.embed_content(
+            result = get_governor("gemini-embed").call(
+                get_genai().embed_content,
+                tokens=sum(estimate_tokens(t) for t in batch),
                 model=EMBEDDING_MODEL,
-                content=text,
+                content=batch,
                 task_type="retrieval_document",
                 title="Code Snippet"
             )
-            return result['embedding']
+            vectors.extend(result['embedding'])
+        except (RateLimitError, ProviderConfigError):
+            raise
         except Exception as e:
-            if "429" in str(e): # Rate limit error
-                time.sleep(2) # Wait 2 seconds and try again
-                continue
-            print(f"Error generating embedding: {e}")
-            return []
-    return []
+            # Fall back to one-by-one so a single bad input doesn't sink the batch
+            print(f"Batch embedding failed ({e}); retrying individually.")
+            vectors.extend(get_embedding(text) for text in batch)
+    return vectors
 
 def get_query_embedding(text: str) -> list:
     """
     Embeds the user question (Task Type is different for queries).
     """
     try:
-        result = genai.embed_content(
+        result = get_governor("gemini-embed").call(
+            get_genai().embed_content,
+            tokens=estimate_tokens(text),
             model=EMBEDDING_MODEL,
             content=text,
             task_type="retrieval_query"
@@ -54,4 +80,27 @@ def get_query_embedding(text: str) -> list:
         return result['embedding']
     except Exception as e:
         print(f"Error embedding query: {e}")
-        return []
\ No newline at end of file
+        return []
+
+def get_query_embeddings(texts: list) -> list:
+    """
+    Embeds many questions with batched requests (EMBED_BATCH_SIZE per call).
+    Returns one vector per text, in order; failed texts get [].
+    """
+    vectors = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        batch = texts[start:start + EMBED_BATCH_SIZE]
+        try:
+            result = get_governor("gemini-embed").call(
+                get_genai().embed_content,
+                tokens=sum(estimate_tokens(t) for t in batch),
+                model=EMBEDDING_MODEL,
+                content=batch,
+                task_type="retrieval_query"
+            )
+            vectors.extend(result['embedding'])
+        except Exception as e:
+            # Fall back to one-by-one so a single bad input doesn't sink the batch
+            print(f"Batch query embedding failed ({e}); retrying individually.")
+            vectors.extend(get_query_embedding(text) for text in batch)
+    return vectors
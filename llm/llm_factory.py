@@ -1,56 +1,53 @@
-import os
-from openai import OpenAI
-import google.generativeai as genai
-from config.settings import GEMINI_API_KEY
-
-# Configure Gemini once
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
+from typing import List, Dict
+from llm.providers import get_provider, get_genai, get_openai_client, ProviderConfigError
+from llm.rate_limiter import get_governor, estimate_tokens
 
 def ask_llm(system_prompt: str, user_prompt: str, model_name: str) -> str:
     """
     Unified function to call any supported LLM.
     """
+    return ask_llm_chat(system_prompt, [{"role": "user", "content": user_prompt}], model_name)
+
+def ask_llm_chat(system_prompt: str, messages: List[Dict], model_name: str) -> str:
+    """
+    Multi-turn version of ask_llm.
+    `messages` is the conversation as [{'role': 'user'|'assistant', 'content': str}, ...],
+    ending with the new user message.
+    """
     
+    provider = get_provider(model_name)
+    governor = get_governor(provider)
+    tokens = estimate_tokens(system_prompt) + sum(estimate_tokens(m["content"]) for m in messages)
+
     # --- GOOGLE GEMINI ---
-    if "gemini" in model_name:
+    if provider == "gemini":
         try:
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(f"{system_prompt}\n\n{user_prompt}")
+            model = get_genai().GenerativeModel(model_name)
+            # System prompt rides on the first user message, as it always has
+            contents = []
+            for i, m in enumerate(messages):
+                text = f"{system_prompt}\n\n{m['content']}" if i == 0 else m["content"]
+                contents.append({"role": "model" if m["role"] == "assistant" else "user", "parts": [text]})
+            if len(contents) == 1:
+                contents = contents[0]["parts"][0]
+            response = governor.call(model.generate_content, contents, tokens=tokens)
             return response.text
         except Exception as e:
             return f"Gemini Error: {str(e)}"
 
     # --- OPENAI / DEEPSEEK / GROK ---
     # These all use the OpenAI Client structure
-    
-    api_key = None
-    base_url = None
-    
-    if "gpt" in model_name or "o1" in model_name:
-        api_key = os.getenv("OPENAI_API_KEY")
-        base_url = "https://api.openai.com/v1"
-        
-    elif "deepseek" in model_name:
-        api_key = os.getenv("DEEPSEEK_API_KEY")
-        base_url = "https://api.deepseek.com"
-        
-    elif "grok" in model_name:
-        api_key = os.getenv("GROK_API_KEY")
-        base_url = "https://api.x.ai/v1"
-
-    if not api_key:
+    try:
+        client = get_openai_client(provider)
+    except ProviderConfigError:
         return f"Error: Missing API Key for {model_name}. Check your .env file."
 
     try:
-        client = OpenAI(api_key=api_key, base_url=base_url)
-        
-        response = client.chat.completions.create(
+        response = governor.call(
+            client.chat.completions.create,
+            tokens=tokens,
             model=model_name,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
+            messages=[{"role": "system", "content": system_prompt}] + messages,
             temperature=0.3
         )
         return response.choices[0].message.content
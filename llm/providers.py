@@ -0,0 +1,67 @@
+import os
+import threading
+from typing import Dict, Optional
+from config.settings import GEMINI_API_KEY
+
+# Provider registry. SDKs are imported and configured on first use only,
+# so importing the app doesn't pay for (or require keys of) unused providers.
+PROVIDERS = {
+    "gemini": {"match": ("gemini",), "env_key": "GEMINI_API_KEY", "base_url": None},
+    "openai": {"match": ("gpt", "o1"), "env_key": "OPENAI_API_KEY", "base_url": "https://api.openai.com/v1"},
+    "deepseek": {"match": ("deepseek",), "env_key": "DEEPSEEK_API_KEY", "base_url": "https://api.deepseek.com"},
+    "grok": {"match": ("grok",), "env_key": "GROK_API_KEY", "base_url": "https://api.x.ai/v1"},
+}
+
+_genai = None
+_openai_clients: Dict[str, object] = {}
+_lock = threading.Lock()
+
+
+class ProviderConfigError(ValueError):
+    """Raised when a provider is used without its API key."""
+
+
+def get_provider(model_name: str) -> str:
+    """
+    Maps a model name to its provider key (used for keys and concurrency limits).
+    """
+    for name, provider in PROVIDERS.items():
+        if any(token in model_name for token in provider["match"]):
+            return name
+    return "unknown"
+
+
+def get_api_key(provider: str) -> Optional[str]:
+    if provider == "gemini":
+        return GEMINI_API_KEY
+    entry = PROVIDERS.get(provider)
+    return os.getenv(entry["env_key"]) if entry else None
+
+
+def get_genai():
+    """The google.generativeai module, imported and configured once."""
+    global _genai
+    if _genai is None:
+        with _lock:
+            if _genai is None:
+                if not GEMINI_API_KEY:
+                    raise ProviderConfigError("GEMINI_API_KEY is not set")
+                import google.generativeai as genai
+                genai.configure(api_key=GEMINI_API_KEY)
+                _genai = genai
+    return _genai
+
+
+def get_openai_client(provider: str):
+    """Cached OpenAI-compatible client for openai / deepseek / grok."""
+    with _lock:
+        if provider not in _openai_clients:
+            api_key = get_api_key(provider)
+            if not api_key:
+                raise ProviderConfigError(f"Missing API Key for {provider}. Check your .env file.")
+            from openai import OpenAI
+            # Retries are the rate governor's job, not the SDK's
+            _openai_clients[provider] = OpenAI(
+                api_key=api_key, base_url=PROVIDERS[provider]["base_url"], max_retries=0
+            )
+        return _openai_clients[provider]
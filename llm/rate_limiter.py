@@ -0,0 +1,257 @@
+import re
+import time
+import random
+import threading
+from typing import Callable, Dict, Optional
+from config.settings import PROVIDER_RATE_LIMITS, RATE_LIMIT_MAX_RETRIES
+
+# Fallback limits for providers missing from PROVIDER_RATE_LIMITS
+DEFAULT_LIMITS = {"rpm": 60, "tpm": 100_000, "max_concurrency": 2}
+
+BACKOFF_BASE = 1.0      # seconds
+BACKOFF_MAX = 60.0      # seconds
+LATENCY_TARGET = 20.0   # seconds; slower calls stop the concurrency from growing
+
+_RETRY_IN_TEXT = re.compile(r"retry (?:in|after) ([\d.]+)\s*s", re.IGNORECASE)
+
+
+class RateLimitError(Exception):
+    """Raised when a provider keeps rate limiting us after all retries."""
+
+
+# --- Error inspection ---
+
+def _status_code(error: Exception) -> Optional[int]:
+    # openai: APIStatusError.status_code, google.api_core: GoogleAPICallError.code
+    for attr in ("status_code", "code"):
+        value = getattr(error, attr, None)
+        try:
+            if value is not None:
+                return int(value)
+        except (TypeError, ValueError):
+            continue
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+# Exception class names (anywhere in the MRO) that mean the call may succeed if repeated.
+# Matched by name so the SDKs stay lazily imported: openai APIConnectionError/APITimeoutError,
+# requests ConnectionError/Timeout, httpx TransportError, google.api_core 503/504.
+_RATE_LIMIT_ERROR_NAMES = {"ResourceExhausted", "TooManyRequests"}
+_TRANSIENT_ERROR_NAMES = {
+    "APIConnectionError", "APITimeoutError",
+    "ConnectionError", "Timeout", "TransportError",
+    "ServiceUnavailable", "DeadlineExceeded",
+}
+
+
+def _error_names(error: Exception) -> set:
+    return {cls.__name__ for cls in type(error).__mro__}
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    if _status_code(error) == 429 or _error_names(error) & _RATE_LIMIT_ERROR_NAMES:
+        return True
+    # The Gemini SDK sometimes only has the gRPC status name in the message
+    return "RESOURCE_EXHAUSTED" in str(error).upper()
+
+
+def is_transient_error(error: Exception) -> bool:
+    status = _status_code(error)
+    if status in (500, 502, 503, 504):
+        return True
+    return isinstance(error, (TimeoutError, ConnectionError)) or bool(_error_names(error) & _TRANSIENT_ERROR_NAMES)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Reads Retry-After (header, gRPC RetryInfo or error text) if the provider sent one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+
+    for detail in getattr(error, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return delay.seconds + delay.nanos / 1e9
+
+    match = _RETRY_IN_TEXT.search(str(error))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+# --- Building blocks ---
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute: float, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0):
+        # Requests bigger than the bucket would never fit; let them drain it instead
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: +1 slot per window of successful fast calls,
+    halved on a 429 (at most once per cooldown so a burst counts once).
+    """
+
+    def __init__(self, max_limit: int, clock: Callable[[], float] = time.monotonic):
+        self.max_limit = max(1, max_limit)
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self.clock = clock
+        self.last_decrease = float("-inf")
+        self.cond = threading.Condition()
+
+    def set_max_limit(self, max_limit: int):
+        """Changes the ceiling at runtime (e.g. a batch job sharing one quota)."""
+        with self.cond:
+            self.max_limit = max(1, max_limit)
+            self.limit = float(self.max_limit)
+            self.cond.notify_all()
+
+    def acquire(self):
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify_all()
+
+    def on_success(self, latency: float):
+        with self.cond:
+            if latency < LATENCY_TARGET:
+                self.limit = min(self.max_limit, self.limit + 1.0 / max(self.limit, 1.0))
+            self.cond.notify_all()
+
+    def on_rate_limit(self, cooldown: float):
+        with self.cond:
+            now = self.clock()
+            if now - self.last_decrease >= cooldown:
+                self.limit = max(1.0, self.limit / 2)
+                self.last_decrease = now
+
+
+class ProviderGovernor:
+    """
+    Every call to one provider goes through here: request and token buckets,
+    adaptive concurrency, and retries with jittered exponential backoff.
+    """
+
+    def __init__(self, name: str, rpm: int, tpm: int, max_concurrency: int,
+                 max_retries: int = RATE_LIMIT_MAX_RETRIES,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.name = name
+        self.requests = TokenBucket(rpm, clock, sleep)
+        self.tokens = TokenBucket(tpm, clock, sleep)
+        self.concurrency = AdaptiveConcurrency(max_concurrency, clock)
+        self.max_retries = max_retries
+        self.clock = clock
+        self.sleep = sleep
+        # Set from Retry-After so every thread pauses, not just the one that got the 429
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _wait_if_blocked(self):
+        while True:
+            with self.lock:
+                wait = self.blocked_until - self.clock()
+            if wait <= 0:
+                return
+            self.sleep(wait)
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": spreads retries so clients don't come back in lockstep
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+    def call(self, fn: Callable, *args, tokens: int = 0, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self._wait_if_blocked()
+            self.requests.acquire(1)
+            if tokens:
+                self.tokens.acquire(tokens)
+
+            self.concurrency.acquire()
+            started = self.clock()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                if not rate_limited and not is_transient_error(e):
+                    raise
+                if attempt == self.max_retries:
+                    if rate_limited:
+                        raise RateLimitError(f"{self.name}: still rate limited after {attempt + 1} attempts") from e
+                    raise
+
+                delay = self._backoff(attempt)
+                if rate_limited:
+                    self.concurrency.on_rate_limit(cooldown=BACKOFF_BASE)
+                    retry_after = retry_after_seconds(e)
+                    if retry_after is not None:
+                        delay = retry_after + random.uniform(0, BACKOFF_BASE)
+                        with self.lock:
+                            self.blocked_until = max(self.blocked_until, self.clock() + retry_after)
+                print(f"{self.name}: {'rate limited' if rate_limited else 'transient error'}, "
+                      f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            else:
+                self.concurrency.on_success(self.clock() - started)
+                return result
+            finally:
+                self.concurrency.release()
+
+            self.sleep(delay)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 chars per token) for the token bucket."""
+    return max(1, len(text) // 4)
+
+
+_governors: Dict[str, ProviderGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(provider: str) -> ProviderGovernor:
+    """Process-wide governor for a provider key (see PROVIDER_RATE_LIMITS)."""
+    with _governors_lock:
+        if provider not in _governors:
+            limits = {**DEFAULT_LIMITS, **PROVIDER_RATE_LIMITS.get(provider, {})}
+            _governors[provider] = ProviderGovernor(
+                provider, limits["rpm"], limits["tpm"], limits["max_concurrency"]
+            )
+        return _governors[provider]
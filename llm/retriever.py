@@ -1,20 +1,105 @@
-from typing import List, Dict
-from llm.gemini_client import get_query_embedding
-from db.vector_store import VectorStore
+import re
+import threading
+from typing import List, Dict, Optional, Callable
+from llm.gemini_client import get_query_embedding, get_query_embeddings
+from db.vector_store import VectorStore, DEFAULT_COLLECTION, collection_for_url, CollectionGoneError
+from db.catalog import RepoCatalog
 
-def retrieve_relevant_chunks(query: str, top_k: int = 5) -> List[Dict]:
+_catalog = None
+# This worker's handle on the active index, its settings and the catalog version they were read at
+_active = {"version": None, "store": None, "settings": None}
+_active_lock = threading.Lock()
+
+def _load_active() -> Dict:
     """
-    1. Embeds query.
-    2. Searches ChromaDB.
+    Reopens the active repo's VectorStore only when the catalog's index_version
+    moves, so each request costs one small SQLite read to notice a new index.
+    """
+    global _catalog
+    if _catalog is None:
+        _catalog = RepoCatalog()
+    version = _catalog.get_index_version()
+    with _active_lock:
+        if _active["store"] is None or _active["version"] != version:
+            repo = _catalog.get_active_repo()
+            _active["store"] = VectorStore((repo or {}).get("collection") or DEFAULT_COLLECTION)
+            base = collection_for_url(repo["url"]) if repo else DEFAULT_COLLECTION
+            _active["settings"] = _catalog.get_index_settings(base)
+            _active["version"] = version
+        return dict(_active)
+
+def active_store() -> VectorStore:
+    return _load_active()["store"]
+
+def active_top_k() -> int:
+    """top_k tuned for the active repo (INDEX_SETTING_DEFAULTS unless overridden)."""
+    return int(_load_active()["settings"]["top_k"])
+
+def get_store(collection_name: Optional[str] = None) -> VectorStore:
+    return VectorStore(collection_name) if collection_name else active_store()
+
+def _search(run: Callable[[VectorStore], List], collection_name: Optional[str] = None) -> List:
+    """
+    Runs `run` against the store. If this worker's handle on the active collection
+    was dropped underneath it (retired by a newer publish), the active collection
+    is looked up again from the catalog and the search retried once.
+    """
+    try:
+        return run(get_store(collection_name))
+    except CollectionGoneError as e:
+        if collection_name:
+            raise
+        print(f"Collection {e} is gone; reloading the active index.")
+        with _active_lock:
+            _active["store"] = None
+        return run(active_store())
+
+# "in `backend/`", "under src/utils/" ... a directory scope written into the question
+_SCOPE_IN_QUERY = re.compile(r"\b(?:in|under|inside|within)\s+`?((?:[\w.-]+/)+)`?", re.IGNORECASE)
+
+def infer_filters(query: str) -> Optional[Dict]:
+    """Picks up a directory scope mentioned in the question, if any."""
+    match = _SCOPE_IN_QUERY.search(query)
+    if not match:
+        return None
+    return {"path_prefix": match.group(1)}
+
+def retrieve_relevant_chunks(query: str, top_k: int = 5, filters: Optional[Dict] = None,
+                             collection_name: Optional[str] = None,
+                             query_vector: Optional[List[float]] = None) -> List[Dict]:
+    """
+    1. Embeds query (unless its `query_vector` is passed in).
+    2. Searches ChromaDB, scoped by `filters` (see db.vector_store.build_filter).
+    Searches the active repo's collection unless `collection_name` is given.
     """
     # 1. Get query vector
-    query_vector = get_query_embedding(query)
+    query_vector = query_vector or get_query_embedding(query)
     if not query_vector:
         print("Failed to embed query.")
         return []
 
     # 2. Search DB
-    store = VectorStore() # Connects to existing DB
-    results = store.search(query_vector, top_k=top_k)
-    
-    return results
\ No newline at end of file
+    return _search(lambda store: store.search(query_vector, top_k=top_k, filters=filters), collection_name)
+
+def retrieve_relevant_chunks_batch(queries: List[str], top_k: int = 5, filters: Optional[Dict] = None,
+                                   collection_name: Optional[str] = None) -> List[List[Dict]]:
+    """
+    Batched version of retrieve_relevant_chunks.
+    Embeds all queries in batched requests and runs one multi-query search.
+    """
+    vectors = get_query_embeddings(queries)
+
+    # Queries whose embedding failed get no context
+    valid = [i for i, v in enumerate(vectors) if v]
+    results = [[] for _ in queries]
+    if not valid:
+        print("Failed to embed any query in the batch.")
+        return results
+
+    found = _search(
+        lambda store: store.search_many([vectors[i] for i in valid], top_k=top_k, filters=filters),
+        collection_name,
+    )
+    for i, chunks in zip(valid, found):
+        results[i] = chunks
+    return results
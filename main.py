@@ -1,31 +1,50 @@
 # main.py
-import os
-from github_client.fetch_repo import download_repo_zip
-from indexing.file_scanner import scan_repo_files
-from indexing.index_builder import make_documents, build_index
-from qa.qa_engine import answer_question
+import argparse
+from github_client.fetch_repo import download_repo_zip, resolve_head
+from indexing.file_scanner import scan_repo
+from indexing.index_builder import make_documents, build_index, publish_index
+from qa.qa_engine import answer_question, generate_repo_overview
+from db.snapshot import export_snapshot, import_snapshot, snapshot_write_lock
+from db.catalog import RepoCatalog
+from db.locks import repo_write_lock
+from db.vector_store import collection_for_url
+from config.settings import BATCH_DOWNLOAD_WORKERS, BATCH_CHUNK_WORKERS, BATCH_REPO_WORKERS
 
 def build_repo_index(github_url: str):
+    # Same per-repo lock as the server, so a running server doesn't build this repo at the same time
+    with repo_write_lock(collection_for_url(github_url)):
+        return _build_repo_index(github_url)
+
+def _build_repo_index(github_url: str):
     print(f"Downloading repo: {github_url}")
-    repo_root = download_repo_zip(github_url)
+    branch, commit_sha = resolve_head(github_url)
+    repo_root = download_repo_zip(github_url, ref=commit_sha or branch)
     print(f"Repo downloaded to: {repo_root}")
 
     print("Scanning files...")
-    file_paths = scan_repo_files(repo_root)
+    scanned = scan_repo(repo_root)
+    file_paths = [f["path"] for f in scanned]
     print(f"Found {len(file_paths)} files.")
 
     print("Building documents...")
     docs = make_documents(file_paths)
 
     print("Building index...")
-    index = build_index(docs)
-    print(f"Index contains {len(index)} chunks.")
+    collection = collection_for_url(github_url)
+    index_stats = build_index(docs, repo_root=repo_root, collection_name=collection)
+    print(f"Index contains {index_stats['chunks_count']} chunks.")
 
-    return index
+    print("Generating repository overview...")
+    summary = generate_repo_overview(index_stats["collection"])
 
-def main():
+    # Questions are answered from the active repo's collection
+    publish_index(RepoCatalog(), github_url, summary, scanned, index_stats, commit_sha)
+
+    return index_stats
+
+def interactive():
     github_url = input("Enter GitHub repository URL: ").strip()
-    index = build_repo_index(github_url)
+    build_repo_index(github_url)
 
     print("\nCodebase QA Assistant is ready.")
     print("Type your question (or 'exit' to quit):\n")
@@ -34,10 +53,58 @@ def main():
         q = input(">> ")
         if q.lower() in ("exit", "quit"):
             break
-        answer = answer_question(q, index)
+        answer = answer_question(q)
         print("\n--- Answer ---")
         print(answer)
         print("--------------\n")
 
+def main():
+    parser = argparse.ArgumentParser(description="Codebase QA Assistant")
+    sub = parser.add_subparsers(dest="command")
+
+    export_cmd = sub.add_parser("export-snapshot", help="Write the active index to a snapshot file")
+    export_cmd.add_argument("path")
+
+    import_cmd = sub.add_parser("import-snapshot", help="Load a snapshot file into the local index")
+    import_cmd.add_argument("path")
+    import_cmd.add_argument("--force", action="store_true", help="Accept a different embedding model")
+
+    batch_cmd = sub.add_parser("batch", help="Index many repos non-interactively")
+    batch_cmd.add_argument("--urls-file", required=True, help="Text file with one GitHub URL per line")
+    batch_cmd.add_argument("--report", default="batch_report.json", help="Where to write the JSON report")
+    batch_cmd.add_argument("--download-workers", type=int, default=BATCH_DOWNLOAD_WORKERS)
+    batch_cmd.add_argument("--chunk-workers", type=int, default=BATCH_CHUNK_WORKERS)
+    batch_cmd.add_argument("--repo-workers", type=int, default=BATCH_REPO_WORKERS)
+    batch_cmd.add_argument("--embed-concurrency", type=int, default=None,
+                           help="Parallel embedding calls across all repos (defaults to the gemini-embed limit)")
+    batch_cmd.add_argument("--no-summary", action="store_true", help="Skip the LLM overview per repo")
+    batch_cmd.add_argument("--force", action="store_true", help="Re-index repos whose commit hasn't changed")
+
+    args = parser.parse_args()
+
+    if args.command == "export-snapshot":
+        export_snapshot(args.path)
+    elif args.command == "import-snapshot":
+        with snapshot_write_lock(args.path):
+            import_snapshot(args.path, force=args.force)
+    elif args.command == "batch":
+        from indexing.batch_indexer import run_batch
+        with open(args.urls_file, "r", encoding="utf-8") as f:
+            urls = [line for line in f if line.strip() and not line.lstrip().startswith("#")]
+        report = run_batch(
+            urls,
+            download_workers=args.download_workers,
+            chunk_workers=args.chunk_workers,
+            repo_workers=args.repo_workers,
+            embed_concurrency=args.embed_concurrency,
+            summaries=not args.no_summary,
+            force=args.force,
+            report_path=args.report,
+        )
+        if report["totals"]["failed"]:
+            raise SystemExit(1)
+    else:
+        interactive()
+
 if __name__ == "__main__":
     main()
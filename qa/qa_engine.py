@@ -1,6 +1,15 @@
-from typing import List, Dict
-from llm.llm_factory import ask_llm 
-from llm.retriever import retrieve_relevant_chunks
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Iterator, Optional
+from llm.llm_factory import ask_llm, ask_llm_chat, get_provider
+from llm.retriever import (
+    retrieve_relevant_chunks, retrieve_relevant_chunks_batch, infer_filters, active_top_k, active_store,
+)
+from llm.rate_limiter import get_governor
+from llm.gemini_client import get_query_embedding
+from qa.sessions import ChatSession, sessions
+from config.settings import FOLLOWUP_TOP_K
+
+NO_CONTEXT_ANSWER = "I could not find relevant code or docs for that question in this repository."
 
 # --- UPDATED SYSTEM PROMPT ---
 SYSTEM_PROMPT = """
@@ -20,27 +29,31 @@ CRITICAL LINE NUMBER RULES:
   2. **The Chunk**: This appears after the separator `...[Context]...`.
 - The "Lines: X-Y" header applies **ONLY** to the code **AFTER** the `...[Context]...` separator.
 - When explaining the file, treat the imports as "File Header" and the code after the separator as "Lines X-Y".
+- For PDF documents the header also has "Page: N"; cite the page, since line numbers there only count within that page.
 """
 
+def chunk_location(c: Dict) -> str:
+    lines_info = f"Lines: {c.get('start_line', '?')}-{c.get('end_line', '?')}"
+    # PDF chunks count lines within their page
+    if c.get("page"):
+        return f"Page: {c['page']} | {lines_info}"
+    return lines_info
+
 def build_context_snippet(chunks: List[Dict]) -> str:
     parts = []
     for c in chunks:
         # --- HEADER FORMAT ---
-        lines_info = f"Lines: {c.get('start_line', '?')}-{c.get('end_line', '?')}"
-        header = f"File: {c['path']} | {lines_info}"
+        header = f"File: {c['path']} | {chunk_location(c)}"
+        if c.get("also_in"):
+            header += f" | Also in: {', '.join(c['also_in'])}"
         body = c["chunk"]
         parts.append(header + "\n" + body)
     return "\n\n---\n\n".join(parts)
 
-def answer_question(query: str, model_name: str = "gemini-2.5-flash") -> str:
-    relevant_chunks = retrieve_relevant_chunks(query, top_k=8)
-    
-    if not relevant_chunks:
-        return "I could not find relevant code or docs for that question in this repository."
-
-    context_text = build_context_snippet(relevant_chunks)
+def build_question_prompt(query: str, chunks: List[Dict]) -> str:
+    context_text = build_context_snippet(chunks)
 
-    user_prompt = f"""
+    return f"""
 User question:
 {query}
 
@@ -48,18 +61,116 @@ Context from repository:
 {context_text}
     """
 
+def retrieve_scoped(query: str, top_k: int, filters: Optional[Dict] = None) -> List[Dict]:
+    if filters:
+        return retrieve_relevant_chunks(query, top_k=top_k, filters=filters)
+    # A scope guessed from the wording is only a hint; fall back to the whole repo
+    inferred = infer_filters(query)
+    if not inferred:
+        return retrieve_relevant_chunks(query, top_k=top_k)
+    # Embedded once, searched twice at most
+    query_vector = get_query_embedding(query)
+    if not query_vector:
+        print("Failed to embed query.")
+        return []
+    chunks = retrieve_relevant_chunks(query, top_k=top_k, filters=inferred, query_vector=query_vector)
+    return chunks or retrieve_relevant_chunks(query, top_k=top_k, query_vector=query_vector)
+
+def answer_question(query: str, model_name: str = "gemini-2.5-flash", filters: Optional[Dict] = None) -> str:
+    relevant_chunks = retrieve_scoped(query, top_k=active_top_k(), filters=filters)
+    
+    if not relevant_chunks:
+        return NO_CONTEXT_ANSWER
+
+    user_prompt = build_question_prompt(query, relevant_chunks)
+
     answer = ask_llm(SYSTEM_PROMPT, user_prompt, model_name=model_name)
     return answer
 
+def build_session_context(session: ChatSession) -> str:
+    """Every chunk shown in the conversation, once, numbered for reference."""
+    parts = []
+    for number, c in enumerate(session.chunks.values(), start=1):
+        header = f"[{number}] File: {c['path']} | {chunk_location(c)}"
+        if c.get("also_in"):
+            header += f" | Also in: {', '.join(c['also_in'])}"
+        parts.append(header + "\n" + c["chunk"])
+    return "Context from repository (snippets are numbered; refer back to them by number):\n\n" + \
+        "\n\n---\n\n".join(parts)
+
+def build_session_question(query: str, session: ChatSession, chunks: List[Dict]) -> str:
+    """The new question plus which context snippets were retrieved for it."""
+    if not chunks:
+        return f"{query}\n\n(No new snippets matched; use the conversation context above.)"
+    refs = ", ".join(f"[{session.chunk_number(c['id'])}]" for c in chunks)
+    return f"{query}\n\n(Most relevant context snippets: {refs})"
+
+def answer_in_session(session_id: str, query: str, model_name: str = "gemini-2.5-flash",
+                      filters: Optional[Dict] = None) -> str:
+    """
+    Answers a question as part of a conversation.
+    Follow-ups are searched together with the previous question (so "that" resolves),
+    with a smaller top_k. Each chunk appears once in the conversation's context block.
+    """
+    with sessions.lock(session_id):
+        session = sessions.get_or_create(session_id, collection=active_store().collection_name)
+        answer = _answer_turn(session, query, model_name, filters)
+        sessions.save(session)
+    sessions.enforce_limits()
+    return answer
+
+def _answer_turn(session: ChatSession, query: str, model_name: str, filters: Optional[Dict]) -> str:
+    if not session.turns:
+        chunks = retrieve_scoped(query, top_k=active_top_k(), filters=filters)
+        if not chunks:
+            return NO_CONTEXT_ANSWER
+    else:
+        chunks = retrieve_scoped(f"{session.last_query}\n{query}", top_k=FOLLOWUP_TOP_K, filters=filters)
+
+    # Chunks go into the context block once; history holds only the bare questions
+    session.remember_chunks(chunks)
+    system_prompt = f"{SYSTEM_PROMPT}\n{build_session_context(session)}"
+    messages = session.messages() + [{"role": "user", "content": build_session_question(query, session, chunks)}]
+    answer = ask_llm_chat(system_prompt, messages, model_name=model_name)
+    session.add_turn(query, answer, [c["id"] for c in chunks])
+    return answer
+
+def answer_questions_batch(queries: List[str], model_name: str = "gemini-2.5-flash",
+                           top_k: Optional[int] = None, filters: Optional[Dict] = None) -> Iterator[Dict]:
+    """
+    Answers many questions at once.
+    Retrieval is shared (batched embeddings + one multi-query search); generation
+    runs concurrently; the provider's rate governor (shared with every other
+    caller in the process) decides how many calls are actually in flight.
+    Yields {'index', 'query', 'answer'} as each answer completes (not in input order).
+    `top_k` defaults to the active repo's tuned value.
+    """
+    all_chunks = retrieve_relevant_chunks_batch(queries, top_k=top_k or active_top_k(), filters=filters)
+
+    def generate(index: int) -> Dict:
+        chunks = all_chunks[index]
+        if not chunks:
+            return {"index": index, "query": queries[index], "answer": NO_CONTEXT_ANSWER}
+        user_prompt = build_question_prompt(queries[index], chunks)
+        answer = ask_llm(SYSTEM_PROMPT, user_prompt, model_name=model_name)
+        return {"index": index, "query": queries[index], "answer": answer}
+
+    workers = get_governor(get_provider(model_name)).concurrency.max_limit
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(generate, i) for i in range(len(queries))]
+        for future in as_completed(futures):
+            yield future.result()
+
 # ... (generate_repo_overview remains the same) ...
 # ... existing imports ...
 
-def generate_repo_overview() -> str:
+def generate_repo_overview(collection_name: Optional[str] = None) -> str:
     """
     Generates a high-level summary covering specific architectural points.
+    Uses the active repo unless `collection_name` points at another index.
     """
     query = "README.md architecture main entry point system design workflow components purpose diagram"
-    relevant_chunks = retrieve_relevant_chunks(query, top_k=15)
+    relevant_chunks = retrieve_relevant_chunks(query, top_k=15, collection_name=collection_name)
     
     if not relevant_chunks:
         return "Unable to generate summary: No relevant documentation or entry points found."
@@ -0,0 +1,131 @@
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional
+from config.settings import SESSION_TTL_SECONDS, SESSION_MAX_COUNT, SESSION_MAX_BYTES, SESSION_MAX_TURNS
+
+
+# Chunk fields a session keeps; enough to cite and quote it again
+CHUNK_FIELDS = ("id", "path", "start_line", "end_line", "page", "also_in", "chunk")
+LOCK_STRIPES = 64
+
+
+class ChatSession:
+    """
+    One conversation: the bare questions and answers so far, plus every chunk
+    shown in it, kept once. Prompts carry the chunks as a single context block
+    and the history as plain question/answer pairs.
+    """
+
+    def __init__(self, session_id: str, collection: Optional[str] = None):
+        self.id = session_id
+        self.collection = collection  # Index the conversation's chunks came from
+        self.turns: List[Dict] = []  # {'query', 'answer', 'chunk_ids'}
+        # Chunk id -> chunk, in the order they were first shown
+        self.chunks: "OrderedDict[str, Dict]" = OrderedDict()
+
+    @property
+    def last_query(self) -> Optional[str]:
+        return self.turns[-1]["query"] if self.turns else None
+
+    def remember_chunks(self, chunks: List[Dict]) -> List[Dict]:
+        """Adds chunks not seen yet in this conversation. Returns the new ones."""
+        new_chunks = []
+        for c in chunks:
+            if c["id"] not in self.chunks:
+                self.chunks[c["id"]] = {key: c.get(key) for key in CHUNK_FIELDS}
+                new_chunks.append(c)
+        return new_chunks
+
+    def chunk_number(self, chunk_id: str) -> int:
+        """1-based position of a chunk in the context block."""
+        return list(self.chunks).index(chunk_id) + 1
+
+    def messages(self) -> List[Dict]:
+        """Conversation so far in {'role', 'content'} form: bare questions and answers."""
+        history = []
+        for turn in self.turns:
+            history.append({"role": "user", "content": turn["query"]})
+            history.append({"role": "assistant", "content": turn["answer"]})
+        return history
+
+    def add_turn(self, query: str, answer: str, chunk_ids: List[str]):
+        """`chunk_ids` are every chunk the turn relied on, new or already shown."""
+        self.turns.append({"query": query, "answer": answer, "chunk_ids": chunk_ids})
+        while len(self.turns) > SESSION_MAX_TURNS:
+            self.turns.pop(0)
+        # Chunks only the dropped turns relied on leave the context block too
+        used = {cid for turn in self.turns for cid in turn["chunk_ids"]}
+        for cid in [cid for cid in self.chunks if cid not in used]:
+            del self.chunks[cid]
+
+    def size_bytes(self) -> int:
+        turns = sum(len(t["query"].encode("utf-8")) + len(t["answer"].encode("utf-8")) for t in self.turns)
+        chunks = sum(len((c["chunk"] or "").encode("utf-8")) for c in self.chunks.values())
+        return turns + chunks
+
+    def to_dict(self) -> Dict:
+        return {"turns": self.turns, "chunks": list(self.chunks.values())}
+
+    @classmethod
+    def from_dict(cls, session_id: str, collection: Optional[str], data: Dict) -> "ChatSession":
+        session = cls(session_id, collection)
+        session.turns = data.get("turns", [])
+        session.chunks = OrderedDict((c["id"], c) for c in data.get("chunks", []))
+        return session
+
+
+class SessionStore:
+    """
+    Sessions kept in the SQLite catalog, so a follow-up finds its conversation
+    whichever server worker (SERVER_WORKERS) it lands on. TTL and LRU eviction
+    by count and total size.
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, max_count: int = SESSION_MAX_COUNT,
+                 max_bytes: int = SESSION_MAX_BYTES, catalog=None):
+        self.ttl = ttl
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self._catalog = catalog
+        # Striped per-session locks: one turn at a time per conversation in this process
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    @property
+    def catalog(self):
+        if self._catalog is None:
+            # Opened on first use, so importing the QA stack touches no files
+            from db.catalog import RepoCatalog
+            self._catalog = RepoCatalog()
+        return self._catalog
+
+    def lock(self, session_id: str) -> threading.Lock:
+        """Hold around get_or_create .. save so concurrent turns don't overwrite each other."""
+        return self._locks[hash(session_id) % LOCK_STRIPES]
+
+    def get_or_create(self, session_id: str, collection: Optional[str] = None) -> ChatSession:
+        """A session on another collection than `collection` starts over: its chunks are gone."""
+        row = self.catalog.get_session(session_id, self.ttl)
+        if row is None or row["collection"] != collection:
+            return ChatSession(session_id, collection)
+        return ChatSession.from_dict(session_id, collection, row["data"])
+
+    def save(self, session: ChatSession):
+        self.catalog.save_session(session.id, session.collection, session.to_dict(), session.size_bytes())
+
+    def delete(self, session_id: str) -> bool:
+        return self.catalog.delete_session(session_id)
+
+    def clear(self):
+        """Drops every session."""
+        self.catalog.delete_sessions()
+
+    def keep_collection(self, collection: str) -> int:
+        """Drops sessions built on any other collection (e.g. after a republish). Returns how many."""
+        return self.catalog.delete_sessions(keep_collection=collection)
+
+    def enforce_limits(self):
+        """Evicts expired, then least recently used sessions until count and size bounds hold."""
+        self.catalog.prune_sessions(self.ttl, self.max_count, self.max_bytes)
+
+
+sessions = SessionStore()
@@ -0,0 +1,69 @@
+# test_file_scanner.py
+from indexing.file_scanner import PatternRule, parse_gitattributes, scan_repo, _linguist_skip
+
+
+def matches(pattern, rel_path, is_dir=False, base=""):
+    return PatternRule(base, pattern, True).matches(rel_path, is_dir)
+
+
+def test_glob_rules_follow_gitignore():
+    # '*' stays inside one segment
+    assert matches("src/*.py", "src/app.py")
+    assert not matches("src/*.py", "src/a/b.py")
+    # '**/' also matches no directory at all
+    assert matches("backend/**/*.py", "backend/app.py")
+    assert matches("backend/**/*.py", "backend/api/v1/routes.py")
+    # No slash: matched against the name at any depth
+    assert matches("*.log", "logs/deep/run.log")
+    # A leading slash anchors to the defining directory
+    assert matches("/build", "build", is_dir=True)
+    assert not matches("/build", "pkg/build", is_dir=True)
+    # Trailing slash: directories only
+    assert matches("dist/", "dist", is_dir=True)
+    assert not matches("dist/", "dist", is_dir=False)
+    # Rules from a nested .gitignore are relative to its directory
+    assert matches("*.tmp", "pkg/cache/x.tmp", base="pkg")
+    assert not matches("*.tmp", "other/x.tmp", base="pkg")
+
+
+def test_linguist_attributes_resolve_independently(tmp_path):
+    (tmp_path / ".gitattributes").write_text(
+        "gen/** linguist-generated\n"
+        "gen/keep.py -linguist-vendored\n"
+        "third_party/** linguist-vendored\n"
+        "third_party/ours.py -linguist-vendored\n"
+        "third_party/made.py linguist-generated=true\n"
+    )
+    rules = parse_gitattributes(str(tmp_path / ".gitattributes"), "")
+    # Unsetting vendored doesn't undo generated
+    assert _linguist_skip(rules, "gen/keep.py", False) == "generated"
+    assert _linguist_skip(rules, "third_party/lib.py", False) == "vendored"
+    assert _linguist_skip(rules, "third_party/ours.py", False) is None
+    assert _linguist_skip(rules, "third_party/made.py", False) == "generated"
+    assert _linguist_skip(rules, "src/app.py", False) is None
+
+
+def test_scan_repo_skips(tmp_path):
+    files = {
+        ".gitignore": "*.log.txt\nbuild/\n!keep.log.txt\n",
+        "src/app.py": "print('hi')\n",
+        "src/run.log.txt": "noise\n",
+        "keep.log.txt": "kept\n",
+        "build/out.py": "x = 1\n",
+        # Long prose lines are not minification
+        "README.md": ("word " * 400 + "\n") * 4,
+        "web/bundle.js": "var a=1;" * 1200,
+        "web/app.min.js": "var a=1;\n",
+        "web/main.js": "function main() {\n  return 1;\n}\n",
+    }
+    for rel, text in files.items():
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    (tmp_path / "src" / "blob.py").write_bytes(b"\x00\x01binary")
+
+    stats = {}
+    found = [f["rel_path"] for f in scan_repo(str(tmp_path), stats=stats)]
+
+    assert found == ["README.md", "keep.log.txt", "src/app.py", "web/main.js"]
+    assert stats == {"gitignored": 2, "minified": 2, "binary": 1}
@@ -0,0 +1,37 @@
+# test_rate_limiter.py
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.quota_stub import QuotaStub
+from llm.rate_limiter import ProviderGovernor, is_rate_limit_error, is_transient_error
+
+
+def test_error_classification():
+    assert not is_rate_limit_error(ValueError("chunk 429 of 1000 failed"))
+    assert is_rate_limit_error(RuntimeError("429 RESOURCE_EXHAUSTED: quota"))
+    assert is_transient_error(requests.ConnectionError("connection reset"))
+    assert is_transient_error(requests.Timeout("read timed out"))
+    assert is_transient_error(TimeoutError())
+    assert not is_transient_error(ValueError("bad request"))
+
+
+def test_governor_completes_calls_under_enforced_quota():
+    # 5 requests per second on the server; the governor's own buckets are far looser,
+    # so every pause comes from the stub's 429s and their Retry-After
+    stub = QuotaStub(limit=5, window=1.0).start()
+    governor = ProviderGovernor("stub", rpm=6000, tpm=10_000_000, max_concurrency=4, max_retries=10)
+
+    def fetch(i):
+        response = requests.get(stub.url, timeout=5)
+        response.raise_for_status()
+        return i
+
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda i: governor.call(fetch, i), range(15)))
+    finally:
+        stub.stop()
+
+    assert results == list(range(15))
+    assert stub.served == 15
+    assert stub.rejected > 0
+    assert stub.early_retries == 0
@@ -0,0 +1,88 @@
+# test_scope_filters.py
+import uuid
+import chromadb
+from db.vector_store import VectorStore, build_filter
+from indexing.file_scanner import describe_file
+
+
+def chunk(rel_path, chunk_id, vector, start_line=1, end_line=10, dup_rel_paths=None):
+    item = {
+        "path": f"/r/{rel_path}",
+        "chunk_id": chunk_id,
+        "chunk": f"{rel_path} #{chunk_id}",
+        "embedding": vector,
+        "start_line": start_line,
+        "end_line": end_line,
+        **describe_file(rel_path),
+    }
+    if dup_rel_paths:
+        # Exact copies share one record, stored under the first path
+        item["dup_paths"] = [f"/r/{p}" for p in dup_rel_paths]
+        item["dup_rel_paths"] = dup_rel_paths
+    return item
+
+
+def make_store():
+    store = VectorStore(f"test_{uuid.uuid4().hex[:12]}", client=chromadb.EphemeralClient())
+    store.add_documents([
+        chunk("backend/app.py", 0, [1.0, 0.0, 0.0]),
+        chunk("backend/api/routes.py", 0, [0.9, 0.1, 0.0], 1, 20),
+        chunk("backend/api/routes.py", 1, [0.9, 0.0, 0.1], 30, 50),
+        chunk("backend_old/app.py", 0, [0.8, 0.2, 0.0]),
+        chunk("src/a/b.py", 0, [0.7, 0.3, 0.0]),
+        chunk("src/main.py", 0, [0.7, 0.0, 0.3]),
+        chunk("docs/guide.md", 0, [0.6, 0.4, 0.0]),
+        chunk("lib/util.py", 0, [0.5, 0.5, 0.0], dup_rel_paths=["lib/util.py", "backend/vendor/util.py"]),
+    ])
+    return store
+
+
+def paths(store, **filters):
+    return sorted(hit["path"] for hit in store.search([1.0, 0.0, 0.0], top_k=20, filters=filters))
+
+
+def test_path_prefix_matches_whole_segments():
+    store = make_store()
+    backend = ["/r/backend/api/routes.py", "/r/backend/api/routes.py", "/r/backend/app.py",
+               "/r/backend/vendor/util.py"]
+    assert paths(store, path_prefix="backend") == backend
+    assert paths(store, path_prefix="backend/") == backend
+    assert paths(store, path_prefix="./backend/api/") == ["/r/backend/api/routes.py"] * 2
+    assert paths(store, path_prefix="backend/app.py") == ["/r/backend/app.py"]
+    assert paths(store, path_prefix="back") == []
+
+
+def test_prefix_pushed_into_chroma():
+    where, _ = build_filter({"path_prefix": "backend/api/"})
+    assert where == {"$or": [{"dir_2": "backend/api"}, {"has_dups": True}]}
+    where, _ = build_filter({"path_prefix": "backend"})
+    assert where == {"$or": [{"dir_1": "backend"}, {"rel_path": "backend"}, {"has_dups": True}]}
+    # Collections without dir_N metadata fall back to top_dir
+    where, _ = build_filter({"path_prefix": "backend/api/"}, ancestry=False)
+    assert where == {"top_dir": "backend"}
+
+
+def test_glob_follows_gitignore_rules():
+    store = make_store()
+    assert "/r/backend/app.py" in paths(store, glob="backend/**/*.py")
+    assert paths(store, glob="src/*.py") == ["/r/src/main.py"]
+    assert paths(store, glob="*.md") == ["/r/docs/guide.md"]
+
+
+def test_duplicate_cited_under_in_scope_path():
+    store = make_store()
+    hits = store.search([0.5, 0.5, 0.0], top_k=5, filters={"path_prefix": "backend/vendor/"})
+    assert [h["path"] for h in hits] == ["/r/backend/vendor/util.py"]
+    assert hits[0]["also_in"] == ["/r/lib/util.py"]
+    # Unscoped, the stored copy is cited and the duplicate listed
+    hit = next(h for h in store.search([0.5, 0.5, 0.0], top_k=20) if "util" in h["path"])
+    assert hit["path"] == "/r/lib/util.py"
+    assert hit["also_in"] == ["/r/backend/vendor/util.py"]
+
+
+def test_line_range_keeps_overlapping_chunks():
+    store = make_store()
+    hits = store.search([1.0, 0.0, 0.0], top_k=20, filters={"path_prefix": "backend/api/", "line_start": 25})
+    assert [(h["start_line"], h["end_line"]) for h in hits] == [(30, 50)]
+    hits = store.search([1.0, 0.0, 0.0], top_k=20, filters={"path_prefix": "backend/api/", "line_end": 20})
+    assert [(h["start_line"], h["end_line"]) for h in hits] == [(1, 20)]